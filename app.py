@@ -3,34 +3,175 @@ Flask server for the Description Generator GUI
 """
 
 from flask import Flask, render_template, request, jsonify, Response, session, redirect, url_for
-import subprocess
+import contextvars
+import hashlib
+import hmac
 import threading
 import queue
-import json
+import logging
+import sqlite3
 import os
 import sys
+import time
+import uuid
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from functools import wraps
-from credentials_util import ensure_google_credentials_file
+from pathlib import Path
+import orjson
+from credentials_util import ensure_google_credentials_file, gspread_client
+from generate_descriptions import DescriptionGenerator, extract_sheet_id, open_worksheet, remember_header
 
 app = Flask(__name__)
-app.secret_key = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production-' + os.urandom(24).hex())
+# A random fallback key invalidates all sessions on every restart, so only use it when SECRET_KEY is unset
+app.secret_key = os.environ.get('SECRET_KEY') or ('dev-' + os.urandom(24).hex())
+if not os.environ.get('SECRET_KEY') and os.environ.get('RAILWAY_ENVIRONMENT'):
+    import warnings
+    warnings.warn("SECRET_KEY is not set - sessions will not survive a restart. Set the SECRET_KEY environment variable.")
 # Configure permanent sessions
 app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=30)  # Sessions last 30 days
 
-# Admin credentials from environment variables
-ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL', 'vemelin055@gmail.com')
-ADMIN_PASSWORD = os.environ.get('ADMIN_PASSWORD', 'Emelin12')
+# Admin credentials from environment variables (no defaults in source)
+ADMIN_EMAIL = os.environ.get('ADMIN_EMAIL', '')
+# Only a keyed hash of the password is kept in memory
+_PASSWORD_HASH_KEY = os.urandom(32)
+
+def _hash_password(password):
+    return hashlib.blake2b(password.encode('utf-8'), key=_PASSWORD_HASH_KEY).digest()
+
+ADMIN_PASSWORD_HASH = _hash_password(os.environ['ADMIN_PASSWORD']) if os.environ.get('ADMIN_PASSWORD') else None
 
-# Warn if using default credentials in production
-if ADMIN_EMAIL == 'vemelin055@gmail.com' and ADMIN_PASSWORD == 'Emelin12' and os.environ.get('RAILWAY_ENVIRONMENT'):
+if not ADMIN_EMAIL or ADMIN_PASSWORD_HASH is None:
     import warnings
-    warnings.warn("Using default admin credentials in production! Set ADMIN_EMAIL and ADMIN_PASSWORD environment variables.")
+    warnings.warn("ADMIN_EMAIL and ADMIN_PASSWORD are not set - login is disabled until both environment variables are provided.")
+
+class LogBus:
+    """Fan out generation log messages to every connected SSE client"""
+
+    def __init__(self, backlog_size=1000):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._backlog = deque(maxlen=backlog_size)
+        self._next_id = 1
+
+    def publish(self, message):
+        with self._lock:
+            event = (self._next_id, message)
+            self._next_id += 1
+            self._backlog.append(event)
+            for subscriber in self._subscribers:
+                subscriber.put_nowait(event)
+
+    def subscribe(self, last_event_id=None):
+        """Register a new client queue, pre-filled with the backlog it has not seen yet"""
+        subscriber = queue.SimpleQueue()
+        with self._lock:
+            for event in self._backlog:
+                if last_event_id is None or event[0] > last_event_id:
+                    subscriber.put_nowait(event)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+class Job:
+    """One generation run: its own log stream, stop flag and executor future"""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.log_bus = LogBus()
+        self.stop_event = threading.Event()
+        self.future = None
 
-# Global variables for process management
-process_queue = queue.Queue()
-current_process = None
-process_thread = None
+    def running(self):
+        return self.future is not None and not self.future.done()
+
+# Static pages are read once at startup; debug mode re-reads them for live editing
+BASE_DIR = Path(__file__).resolve().parent
+
+def _read_page(name):
+    return (BASE_DIR / name).read_text(encoding='utf-8')
+
+_PAGES = {name: _read_page(name) for name in ('gui.html', 'login.html')}
+
+def page(name):
+    if app.debug:
+        return _read_page(name)
+    return _PAGES[name]
+
+# Global variables for job management
+MAX_PARALLEL_JOBS = int(os.environ.get('MAX_PARALLEL_JOBS', '2'))
+MAX_KEPT_JOBS = 20  # finished jobs are kept so late SSE clients can still replay them
+_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_PARALLEL_JOBS, thread_name_prefix='gen')
+_JOBS_LOCK = threading.Lock()
+jobs = {}  # job id -> Job, in start order
+latest_job_id = None
+
+def get_job(job_id=None):
+    """Return the job with the given id, or the most recently started one"""
+    with _JOBS_LOCK:
+        return jobs.get(job_id or latest_job_id)
+
+def running_jobs():
+    with _JOBS_LOCK:
+        return [job for job in jobs.values() if job.running()]
+
+# Seconds between SSE keep-alive comments when no log lines arrive
+SSE_KEEPALIVE_INTERVAL = float(os.environ.get("SSE_KEEPALIVE_INTERVAL", "15"))
+
+def get_gspread_client():
+    """Return the process-wide authorized gspread client, shared with generation jobs"""
+    return gspread_client(str(ensure_google_credentials_file()))
+
+# Pay the credentials parsing cost at startup rather than on the first preview;
+# if credentials are not available yet, /api/preview reports the error itself
+try:
+    get_gspread_client()
+except Exception:
+    pass
+
+# Short-lived cache of preview payloads keyed by (sheet_id, sheet_name, header_row)
+PREVIEW_CACHE_TTL = 60  # seconds
+PREVIEW_CACHE_MAXSIZE = 64
+_PREVIEW_CACHE = {}
+_PREVIEW_CACHE_LOCK = threading.Lock()
+
+def load_preview(sheet_id, sheet_name, header_row):
+    """Return (headers, rows) for the preview, reusing recent results"""
+    key = (sheet_id, sheet_name, header_row)
+    now = time.monotonic()
+    with _PREVIEW_CACHE_LOCK:
+        cached = _PREVIEW_CACHE.get(key)
+        if cached and now - cached[0] < PREVIEW_CACHE_TTL:
+            return cached[1]
+
+    worksheet = open_worksheet(get_gspread_client(), sheet_id, sheet_name)
+
+    # Fetch only the header row and the 9 preview rows below it
+    header_row = max(1, header_row)
+    values = worksheet.get_values(f"{header_row}:{header_row + 9}")
+    headers = values[0] if values else []
+    rows = values[1:]
+    # No total row count: the grid size includes empty padding rows, and counting
+    # the filled ones would mean downloading the whole sheet again
+    result = (headers, rows)
+
+    # The job started from this preview then resolves its columns without another header read
+    try:
+        remember_header(sheet_id, sheet_name, header_row, headers)
+    except sqlite3.Error:
+        pass
+
+    with _PREVIEW_CACHE_LOCK:
+        if len(_PREVIEW_CACHE) >= PREVIEW_CACHE_MAXSIZE:
+            _PREVIEW_CACHE.clear()
+        _PREVIEW_CACHE[key] = (now, result)
+    return result
 
 def login_required(f):
     @wraps(f)
@@ -45,91 +186,129 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
-def run_generation(sheet_id, sheet_name, header_row, article_column, name_column, description_column, start_row, end_row, prompt_text, force=False, dry_run=False):
-    """Run the description generation script with given parameters"""
-    # Escape the prompt text for safe insertion into Python code
-    if prompt_text and prompt_text.strip():
-        # Escape backslashes and quotes for safe string insertion
-        escaped_prompt = (prompt_text
-                          .replace('\\', '\\\\')  # Escape backslashes first
-                          .replace('"', '\\"')    # Escape double quotes
-                          .replace("'", "\\'")    # Escape single quotes
-                          .replace('\n', '\\n')   # Escape newlines
-                          .replace('\r', '\\r'))  # Escape carriage returns
-        custom_prompt_value = f'"{escaped_prompt}"'
-    else:
-        custom_prompt_value = 'None'
-    
-    # Create a temporary script to handle custom columns and header row
-    temp_script = f"""
-import sys
-sys.path.insert(0, '.')
-from generate_descriptions import DescriptionGenerator, parse_args
-
-# Modify the column mapping
-args = parse_args()
-args.sheet_id = "{sheet_id}"
-args.worksheet = "{sheet_name}"
-
-# Create generator with custom args
-generator = DescriptionGenerator(
-    sheet_id=args.sheet_id,
-    worksheet_name=args.worksheet,
-    header_row={header_row},
-    article_column="{article_column}",
-    name_column="{name_column}",
-    description_column="{description_column}",
-    custom_prompt={custom_prompt_value},
-    force=args.force,
-    dry_run=args.dry_run,
-    max_retries=args.max_retries,
-    retry_delay=args.retry_delay,
-    log_level=args.log_level
-)
-
-# Modify the description column resolution
-try:
-    count = generator.process(
-        start_row={start_row},
-        end_row={end_row} if {end_row} else None,
-        limit=None,
-        sleep=0.0
-    )
-    print(f"✅ Обработано строк: {{count}}")
-except Exception as e:
-    print(f"❌ Ошибка: {{e}}")
-"""
+# Upper bound for concurrent LLM requests of one job; the rate limiter paces them anyway
+MAX_CONCURRENCY = 32
 
-    # Write temporary script and run it
-    temp_file = "temp_generate.py"
-    with open(temp_file, 'w', encoding='utf-8') as f:
-        f.write(temp_script)
-    
+def _int_field(data, key, default):
+    value = data.get(key, default)
+    if isinstance(value, bool):
+        raise ValueError(f"Поле '{key}' должно быть числом")
     try:
-        process = subprocess.Popen(
-            [sys.executable, temp_file],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT,
-            text=True,
-            bufsize=1,
-            universal_newlines=True
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Поле '{key}' должно быть числом") from None
+
+@dataclass
+class StartRequest:
+    """Parameters of /api/start, parsed and validated once"""
+    sheet_id: str
+    sheet_name: str
+    header_row: int = 1
+    article_column: str = 'Артикул'
+    name_column: str = 'Наименование'
+    description_column: str = 'Описание'
+    start_row: int = 2
+    end_row: int = 100
+    prompt: str = ''
+    force: bool = False
+    dry_run: bool = False
+    concurrency: int = 8
+
+    @classmethod
+    def from_json(cls, data):
+        if not isinstance(data, dict):
+            raise ValueError('Некорректный запрос: ожидается JSON-объект')
+
+        params = cls(
+            # Extract sheet ID from URL if full URL is provided
+            sheet_id=extract_sheet_id(str(data.get('sheet_url') or '')),
+            sheet_name=str(data.get('sheet_name') or ''),
+            header_row=_int_field(data, 'header_row', 1),
+            article_column=str(data.get('article_column', 'Артикул') or ''),
+            name_column=str(data.get('name_column', 'Наименование') or ''),
+            description_column=str(data.get('description_column', 'Описание') or ''),
+            start_row=_int_field(data, 'start_row', 2),
+            end_row=_int_field(data, 'end_row', 100),
+            prompt=str(data.get('prompt') or ''),
+            force=bool(data.get('force', False)),
+            dry_run=bool(data.get('dry_run', False)),
+            concurrency=_int_field(data, 'concurrency', 8),
         )
-        
-        for line in process.stdout:
-            yield line
-            
-        process.wait()
-        if process.returncode != 0:
-            yield f"❌ Process exited with code {process.returncode}\n"
-            
+
+        if params.start_row >= params.end_row:
+            raise ValueError('Начальная строка должна быть меньше конечной')
+        if params.header_row < 1 or params.start_row < 1:
+            raise ValueError('Номера строк должны быть положительными')
+        if not 1 <= params.concurrency <= MAX_CONCURRENCY:
+            raise ValueError(f'Параллельных запросов должно быть от 1 до {MAX_CONCURRENCY}')
+        if not params.sheet_id or not params.sheet_name:
+            raise ValueError('Необходимо указать ID таблицы и название листа')
+        return params
+
+_current_log_handler = contextvars.ContextVar('current_log_handler')
+
+class LogLineHandler(logging.Handler):
+    """Forward DescriptionGenerator log records to a callback as text lines"""
+
+    def __init__(self, on_line):
+        super().__init__()
+        self.on_line = on_line
+        self.setFormatter(logging.Formatter("%(asctime)s | %(levelname)s | %(message)s"))
+
+    def emit(self, record):
+        # Parallel jobs share the generator logger, so keep only records logged
+        # from this job's context (asyncio tasks and to_thread calls inherit it)
+        if _current_log_handler.get(None) is not self:
+            return
+        try:
+            self.on_line(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+def run_generation(sheet_id, sheet_name, header_row, article_column, name_column, description_column, start_row, end_row, prompt_text, force=False, dry_run=False, on_line=print, stop_event=None, concurrency=8):
+    """Run description generation in-process, passing every log line to on_line"""
+    handler = LogLineHandler(on_line)
+    handler_token = _current_log_handler.set(handler)
+    generator_logger = logging.getLogger("generate_descriptions")
+    generator_logger.addHandler(handler)
+    generator = None
+    try:
+        generator = DescriptionGenerator(
+            sheet_id=sheet_id,
+            worksheet_name=sheet_name,
+            header_row=header_row,
+            article_column=article_column,
+            name_column=name_column,
+            description_column=description_column,
+            custom_prompt=prompt_text if prompt_text and prompt_text.strip() else None,
+            force=force,
+            dry_run=dry_run,
+            concurrency=concurrency,
+        )
+        count = generator.process(
+            start_row=start_row,
+            end_row=end_row or None,
+            limit=None,
+            sleep=0.0,
+            stop_event=stop_event,
+        )
+        on_line(f"✅ Обработано строк: {count}")
     except Exception as e:
-        yield f"❌ Error running process: {str(e)}\n"
+        on_line(f"❌ Ошибка: {e}")
     finally:
-        # Clean up temporary file
-        try:
-            os.remove(temp_file)
-        except:
-            pass
+        if generator is not None:
+            generator.close()
+        generator_logger.removeHandler(handler)
+        _current_log_handler.reset(handler_token)
+
+def gzip_stream(frames):
+    """Gzip a stream of byte frames, flushing after each so none is held back"""
+    compressor = zlib.compressobj(1, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    try:
+        for frame in frames:
+            yield compressor.compress(frame) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    finally:
+        frames.close()
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -137,7 +316,10 @@ def login():
         email = request.form.get('email', '').strip()
         password = request.form.get('password', '')
         
-        if email == ADMIN_EMAIL and password == ADMIN_PASSWORD:
+        # Compare both fields in constant time, without short-circuiting
+        email_ok = hmac.compare_digest(email.encode('utf-8'), ADMIN_EMAIL.encode('utf-8'))
+        password_ok = ADMIN_PASSWORD_HASH is not None and hmac.compare_digest(_hash_password(password), ADMIN_PASSWORD_HASH)
+        if email_ok and password_ok and ADMIN_EMAIL:
             session.permanent = True  # Make session permanent
             session['logged_in'] = True
             session['email'] = email
@@ -146,7 +328,7 @@ def login():
             return jsonify({'success': False, 'error': 'Неверный email или пароль'}), 401
     
     # GET request - show login page
-    return open('login.html', 'r', encoding='utf-8').read()
+    return page('login.html')
 
 @app.route('/logout')
 def logout():
@@ -156,69 +338,58 @@ def logout():
 @app.route('/')
 @login_required
 def index():
-    return open('gui.html', 'r', encoding='utf-8').read()
+    return page('gui.html')
 
 @app.route('/api/start', methods=['POST'])
 @login_required
 def start_generation():
-    global process_thread
-    
-    data = request.json
-    sheet_url = data.get('sheet_url', '')
-    sheet_name = data.get('sheet_name', '')
-    header_row = data.get('header_row', 1)
-    article_column = data.get('article_column', 'Артикул')
-    name_column = data.get('name_column', 'Наименование')
-    description_column = data.get('description_column', 'Описание')
-    start_row = data.get('start_row', 2)
-    end_row = data.get('end_row', 100)
-    prompt = data.get('prompt', '')
-    force = data.get('force', False)
-    dry_run = data.get('dry_run', False)
-    
-    # Extract sheet ID from URL if full URL is provided
-    sheet_id = sheet_url
-    if 'spreadsheets/d/' in sheet_url:
-        sheet_id = sheet_url.split('/d/')[1].split('/')[0]
+    global latest_job_id
     
-    # Validate inputs
-    if start_row >= end_row:
-        return jsonify({'error': 'Начальная строка должна быть меньше конечной'}), 400
-    
-    if not sheet_id or not sheet_name:
-        return jsonify({'error': 'Необходимо указать ID таблицы и название листа'}), 400
-    
-    # Clear the queue
-    while not process_queue.empty():
-        process_queue.get_nowait()
+    try:
+        params = StartRequest.from_json(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
+    job = Job()
+    log_bus = job.log_bus
+    stop_event = job.stop_event
+
     def generation_worker():
         error_count = 0
         max_errors = 5  # Stop after 5 consecutive errors
+        aborted = False
+
+        def publish(line):
+            nonlocal error_count, aborted
+            if aborted:
+                return
+            line_stripped = line.strip()
+            # Check if line indicates an error
+            if '❌' in line_stripped or 'ERROR' in line_stripped or 'Ошибка' in line_stripped:
+                error_count += 1
+                if error_count >= max_errors:
+                    aborted = True
+                    stop_event.set()
+                    log_bus.publish({
+                        'timestamp': datetime.now().isoformat(),
+                        'message': f'❌ КРИТИЧЕСКАЯ ОШИБКА: Превышено максимальное количество ошибок ({max_errors}). Генерация остановлена.',
+                        'type': 'error'
+                    })
+                    return
+            else:
+                error_count = 0  # Reset error count on success
+
+            log_bus.publish({
+                'timestamp': datetime.now().isoformat(),
+                'message': line_stripped,
+                'type': 'error' if '❌' in line_stripped or 'ERROR' in line_stripped else 'info'
+            })
+
         try:
-            for line in run_generation(sheet_id, sheet_name, header_row, article_column, name_column, description_column, start_row, end_row, prompt, force, dry_run):
-                line_stripped = line.strip()
-                # Check if line indicates an error
-                if '❌' in line_stripped or 'ERROR' in line_stripped or 'Ошибка' in line_stripped:
-                    error_count += 1
-                    if error_count >= max_errors:
-                        process_queue.put({
-                            'timestamp': datetime.now().isoformat(),
-                            'message': f'❌ КРИТИЧЕСКАЯ ОШИБКА: Превышено максимальное количество ошибок ({max_errors}). Генерация остановлена.',
-                            'type': 'error'
-                        })
-                        break
-                else:
-                    error_count = 0  # Reset error count on success
-                
-                process_queue.put({
-                    'timestamp': datetime.now().isoformat(),
-                    'message': line_stripped,
-                    'type': 'error' if '❌' in line_stripped or 'ERROR' in line_stripped else 'info'
-                })
-            
-            if error_count < max_errors:
-                process_queue.put({
+            run_generation(params.sheet_id, params.sheet_name, params.header_row, params.article_column, params.name_column, params.description_column, params.start_row, params.end_row, params.prompt, params.force, params.dry_run, on_line=publish, stop_event=stop_event, concurrency=params.concurrency)
+
+            if not stop_event.is_set():
+                log_bus.publish({
                     'timestamp': datetime.now().isoformat(),
                     'message': '✅ Генерация завершена',
                     'type': 'success'
@@ -226,37 +397,45 @@ def start_generation():
         except Exception as e:
             import traceback
             error_trace = traceback.format_exc()
-            process_queue.put({
+            log_bus.publish({
                 'timestamp': datetime.now().isoformat(),
                 'message': f'❌ КРИТИЧЕСКАЯ ОШИБКА: {str(e)}\n{error_trace}',
                 'type': 'error'
             })
     
-    # Start the generation in a separate thread
-    process_thread = threading.Thread(target=generation_worker)
-    process_thread.daemon = True
-    process_thread.start()
+    # Run at most MAX_PARALLEL_JOBS generations at a time
+    with _JOBS_LOCK:
+        if sum(1 for other in jobs.values() if other.running()) >= MAX_PARALLEL_JOBS:
+            return jsonify({'error': f'Уже запущено генераций: {MAX_PARALLEL_JOBS}. Дождитесь завершения или остановите одну из них.'}), 409
+        # Forget the oldest finished jobs
+        finished = [old_id for old_id, old in jobs.items() if not old.running()]
+        for old_id in finished[:max(0, len(jobs) + 1 - MAX_KEPT_JOBS)]:
+            del jobs[old_id]
+        jobs[job.id] = job
+        latest_job_id = job.id
+        job.future = _EXECUTOR.submit(generation_worker)
     
-    return jsonify({'status': 'started', 'start_row': start_row, 'end_row': end_row})
+    return jsonify({'status': 'started', 'job_id': job.id, 'start_row': params.start_row, 'end_row': params.end_row})
 
 @app.route('/api/stop', methods=['POST'])
 @login_required
 def stop_generation():
-    global process_thread
-    
-    # Stop the generation thread by setting a flag (simple approach)
-    # In a real implementation, we'd need a more robust way to stop the process
-    if process_thread and process_thread.is_alive():
-        # We'll rely on the frontend to handle the stop by not processing further messages
-        return jsonify({'status': 'stop_requested'})
+    data = request.get_json(silent=True) or {}
+    job = get_job(data.get('job_id'))
+    # Ask the running generator to stop before its next row
+    if job and job.running():
+        job.stop_event.set()
+        return jsonify({'status': 'stop_requested', 'job_id': job.id})
     
     return jsonify({'status': 'no process running'})
 
 @app.route('/api/status')
 @login_required
 def status():
+    active = running_jobs()
     return jsonify({
-        'active': process_thread.is_alive() if process_thread else False
+        'active': bool(active),
+        'jobs': [job.id for job in active]
     })
 
 @app.route('/api/preview', methods=['POST'])
@@ -268,47 +447,23 @@ def preview_sheet():
         sheet_name = data.get('sheet_name', '')
         
         # Extract sheet ID from URL if full URL is provided
-        sheet_id = sheet_url
-        if 'spreadsheets/d/' in sheet_url:
-            sheet_id = sheet_url.split('/d/')[1].split('/')[0]
+        sheet_id = extract_sheet_id(sheet_url)
         
         if not sheet_id:
             return jsonify({'error': 'Не указан ID таблицы'}), 400
         
-        # Import gspread here to avoid dependency issues
-        import gspread
-        from google.oauth2.service_account import Credentials
-        
-        # Set up credentials
-        scopes = [
-            "https://www.googleapis.com/auth/spreadsheets",
-            "https://www.googleapis.com/auth/drive",
-        ]
-        
-        credentials_file = ensure_google_credentials_file()
-        creds = Credentials.from_service_account_file(str(credentials_file), scopes=scopes)
-        gc = gspread.authorize(creds)
-        
-        # Open the spreadsheet
-        spreadsheet = gc.open_by_key(sheet_id)
-        worksheet = spreadsheet.worksheet(sheet_name)
-        
-        # Get header row (default to 1, convert to 0-based index)
-        header_row = data.get('header_row', 1)
-        header_row_idx = max(0, header_row - 1)
-        
-        # Get all data
-        all_data = worksheet.get_all_values()
-        headers = all_data[header_row_idx] if len(all_data) > header_row_idx else []
-        
-        # Get preview rows (skip header row, show next 9 rows)
-        preview_start = header_row_idx + 1
-        rows = all_data[preview_start:preview_start + 9] if len(all_data) > preview_start else []
+        # Get header row (default to 1) and the rows right below it
+        try:
+            header_row = _int_field(data, 'header_row', 1)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if header_row < 1:
+            return jsonify({'error': 'Номера строк должны быть положительными'}), 400
+        headers, rows = load_preview(sheet_id, sheet_name, header_row)
         
         return jsonify({
             'headers': headers,
-            'rows': rows,
-            'total_rows': len(all_data) - header_row - 1 if len(all_data) > header_row else 0
+            'rows': rows
         })
         
     except Exception as e:
@@ -317,17 +472,43 @@ def preview_sheet():
 @app.route('/api/logs')
 @login_required
 def stream_logs():
+    job = get_job(request.args.get('job_id'))
+    if job is None:
+        return jsonify({'error': 'Генерация не найдена'}), 404
+
+    # Resume after the last event the browser saw when EventSource reconnects
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        last_event_id = None
+    log_bus = job.log_bus
+
     def generate():
-        while True:
-            try:
-                log = process_queue.get(timeout=1)
-                yield f"data: {json.dumps(log)}\n\n"
-            except queue.Empty:
-                yield "data: {\"keep_alive\": true}\n\n"
+        subscriber = log_bus.subscribe(last_event_id)
+        try:
+            # Flush an initial comment so the connection opens immediately
+            yield b": ok\n\n"
+            while True:
+                try:
+                    event_id, log = subscriber.get(timeout=SSE_KEEPALIVE_INTERVAL)
+                    yield b"id: %d\ndata: %s\n\n" % (event_id, orjson.dumps(log))
+                except queue.Empty:
+                    yield b": keepalive\n\n"
+        finally:
+            log_bus.unsubscribe(subscriber)
     
+    # Log lines compress well; a sync flush per frame keeps delivery immediate
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = Response(gzip_stream(generate()), mimetype='text/event-stream')
+        response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
     return Response(generate(), mimetype='text/event-stream')
 
 if __name__ == '__main__':
+    # The built-in server is for local development only; production runs under gunicorn
+    print("⚠️ Это сервер разработки Flask. Для продакшена: gunicorn --config gunicorn.conf.py app:app",
+          file=sys.stderr)
     port = int(os.environ.get("PORT", 5001))
     use_debug = os.environ.get("FLASK_DEBUG", "0") == "1"
     app.run(
@@ -335,4 +516,5 @@ if __name__ == '__main__':
         port=port,
         host="0.0.0.0",
         use_reloader=use_debug,
+        threaded=True,
     )
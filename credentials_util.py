@@ -5,14 +5,26 @@ Helpers for managing Google service-account credentials in different environment
 from __future__ import annotations
 
 import base64
-import json
+import functools
 import os
 from pathlib import Path
 from typing import Optional
 
+import gspread
+import orjson
+from google.auth.transport.requests import AuthorizedSession
+from google.oauth2.service_account import Credentials
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 
 DEFAULT_CREDENTIALS_PATH = Path("google_credentials.json")
 
+SCOPES = (
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive",
+)
+
 
 def ensure_google_credentials_file(
     destination: Optional[str | os.PathLike] = None,
@@ -28,19 +40,21 @@ def ensure_google_credentials_file(
     Raises:
         FileNotFoundError: if no file exists and no environment variable is provided.
         ValueError: if the base64 payload cannot be decoded.
-        json.JSONDecodeError: if provided JSON is invalid.
+        json.JSONDecodeError: if provided JSON is invalid
+            (raised as its subclass ``orjson.JSONDecodeError``).
     """
 
     dest_path = Path(destination) if destination else DEFAULT_CREDENTIALS_PATH
     if dest_path.exists():
         return dest_path
 
-    raw_json = os.getenv("GOOGLE_CREDENTIALS_JSON")
+    raw_json: bytes = os.getenv("GOOGLE_CREDENTIALS_JSON", "").encode("utf-8")
     if not raw_json:
         b64_payload = os.getenv("GOOGLE_CREDENTIALS_BASE64")
         if b64_payload:
             try:
-                raw_json = base64.b64decode(b64_payload).decode("utf-8")
+                # `base64 file` wraps at 76 columns; strict validation would reject those newlines
+                raw_json = base64.b64decode("".join(b64_payload.split()), validate=True)
             except Exception as exc:  # noqa: BLE001
                 raise ValueError(
                     "Не удалось декодировать GOOGLE_CREDENTIALS_BASE64"
@@ -52,11 +66,58 @@ def ensure_google_credentials_file(
             "Установите переменную окружения GOOGLE_CREDENTIALS_JSON или GOOGLE_CREDENTIALS_BASE64."
         )
 
-    # Validate JSON before writing to disk
-    json.loads(raw_json)
-    dest_path.write_text(raw_json, encoding="utf-8")
+    # Validate JSON (and UTF-8) before writing the payload to disk unchanged
+    orjson.loads(raw_json)
+    dest_path.write_bytes(raw_json)
     return dest_path
 
 
-__all__ = ["ensure_google_credentials_file", "DEFAULT_CREDENTIALS_PATH"]
+def authorized_session(creds: Credentials, pool_size: int = 10) -> AuthorizedSession:
+    """
+    Build a Sheets session that keeps up to `pool_size` connections alive.
+
+    Transient 429/5xx answers are retried with backoff for idempotent requests
+    only (urllib3's default), so appends and batch updates are never sent twice.
+    Responses are requested gzip-compressed.
+    """
+    session = AuthorizedSession(creds)
+    # Google APIs gzip responses only when the User-Agent also mentions gzip
+    session.headers["User-Agent"] = f"{session.headers.get('User-Agent', 'python-requests')} (gzip)"
+    # raise_on_status=False hands the last 429/5xx response to gspread, which raises its
+    # usual APIError instead of requests' RetryError
+    retries = Retry(
+        total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504), raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max(10, pool_size), max_retries=retries)
+    session.mount("https://", adapter)
+    return session
+
+
+@functools.lru_cache(maxsize=None)
+def gspread_client(credentials_file: str = str(DEFAULT_CREDENTIALS_PATH)) -> gspread.Client:
+    """
+    Return the process-wide authorized gspread client for a service-account file.
+
+    Every caller in the process shares it, so the key file is parsed once and the
+    OAuth token is fetched once and then refreshed only when it expires.
+    """
+    creds = Credentials.from_service_account_file(credentials_file, scopes=SCOPES)
+    return gspread.authorize(creds, session=authorized_session(creds))
+
+
+@functools.lru_cache(maxsize=None)
+def _gspread_client_from_json(info_json: bytes) -> gspread.Client:
+    creds = Credentials.from_service_account_info(orjson.loads(info_json), scopes=SCOPES)
+    return gspread.authorize(creds, session=authorized_session(creds))
+
+
+def gspread_client_from_info(info: dict) -> gspread.Client:
+    """
+    Like `gspread_client`, for service-account info given as a dict (e.g. built from
+    environment variables); the same info always yields the same client.
+    """
+    return _gspread_client_from_json(orjson.dumps(info, option=orjson.OPT_SORT_KEYS))
+
+
+__all__ = ["ensure_google_credentials_file", "authorized_session", "gspread_client", "gspread_client_from_info", "DEFAULT_CREDENTIALS_PATH", "SCOPES"]
 
@@ -14,25 +14,48 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
+import contextvars
+import functools
+import hashlib
+import importlib.util
+import io
+import json
 import logging
 import os
+import random
 import re
+import sqlite3
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple, Union
 
 from dotenv import load_dotenv
 import gspread
-from google.oauth2.service_account import Credentials
-from groq import Groq
+from groq import AsyncGroq
+from groq import DefaultAsyncHttpxClient
 from groq import GroqError
-import requests
+from groq import RateLimitError
+from gspread.utils import rowcol_to_a1
+import httpx
+import orjson
 from credentials_util import (
     DEFAULT_CREDENTIALS_PATH,
     ensure_google_credentials_file,
+    gspread_client,
 )
 
+# httpx only speaks HTTP/2 with the optional h2 package (httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+try:  # libuv-based loop, cheaper per socket event; optional and not available on Windows
+    import uvloop
+except ImportError:  # pragma: no cover - depends on the platform
+    uvloop = None
+
 
 DEFAULT_SHEET_ID = "1f0FkNY39YjnaVTTMfUBaN5JlyDK5ZCzM1MLW_qWnCDI"
 DEFAULT_WORKSHEET = "КомТехАвто"
@@ -40,6 +63,59 @@ SERVICE_ACCOUNT_FILE = os.environ.get(
     "GOOGLE_CREDENTIALS_FILE", str(DEFAULT_CREDENTIALS_PATH)
 )
 
+SHEET_ID_RE = re.compile(r"/spreadsheets/d/([A-Za-z0-9_-]+)")
+
+
+def new_event_loop() -> asyncio.AbstractEventLoop:
+    """Create a uvloop event loop when uvloop is installed, the default one otherwise."""
+    return uvloop.new_event_loop() if uvloop is not None else asyncio.new_event_loop()
+
+
+def extract_sheet_id(sheet_input: str) -> str:
+    """Return the spreadsheet ID from a Google Sheets URL, or the input itself."""
+    match = SHEET_ID_RE.search(sheet_input)
+    return match.group(1) if match else sheet_input.strip()
+
+
+class _Spreadsheet(gspread.Spreadsheet):
+    """Spreadsheet whose next worksheet() lookup reuses the metadata it last fetched.
+
+    open_by_key().worksheet() otherwise downloads the same metadata twice. Relies on
+    gspread 6 internals (the constructor shape, Client.http_client), hence the pin
+    in requirements.txt.
+    """
+
+    _metadata = None
+
+    def fetch_sheet_metadata(self, params=None):
+        metadata = super().fetch_sheet_metadata(params)
+        if params is None:
+            self._metadata = metadata
+        return metadata
+
+    def worksheet(self, title: str) -> gspread.Worksheet:
+        metadata, self._metadata = self._metadata, None
+        if metadata is None:
+            return super().worksheet(title)
+        for item in metadata.get("sheets", []):
+            if item["properties"]["title"] == title:
+                return gspread.Worksheet(self, item["properties"], self.id, self.client)
+        raise gspread.WorksheetNotFound(title)
+
+
+def open_worksheet(client: gspread.Client, sheet_id: str, title: str) -> gspread.Worksheet:
+    """Open a worksheet by title with a single metadata request."""
+    try:
+        spreadsheet = _Spreadsheet(client.http_client, {"id": sheet_id})
+    except gspread.exceptions.APIError as exc:
+        # Same errors as Client.open_by_key
+        if exc.response.status_code == 404:
+            raise gspread.SpreadsheetNotFound(exc.response) from exc
+        if exc.response.status_code == 403:
+            raise PermissionError from exc
+        raise
+    return spreadsheet.worksheet(title)
+
 
 PROMPT_TEMPLATE_WITH_ARTICLE = """Ты специалист по автозапчастям и маркетолог. Используй данные:
 - Артикул: {article}
@@ -62,6 +138,314 @@ PROMPT_TEMPLATE_WITHOUT_ARTICLE = """Ты специалист по автоза
 4. Объём 90–140 слов. Не добавляй произвольные цены и ссылки.
 """
 
+SYSTEM_MSG_CUSTOM = "Ты пишешь продающие описания автозапчастей. Следуй инструкциям в промпте."
+SYSTEM_MSG_RUSSIAN = "Ты пишешь продающие описания автозапчастей. Используй только русский язык."
+RETRY_MSG = "Предыдущий ответ был пустой или некорректный. Сейчас обязательно верни развёрнутое описание."
+
+# Constant fragments around the placeholders, so building a prompt is plain concatenation
+_WITH_ARTICLE_HEAD, _, _rest = PROMPT_TEMPLATE_WITH_ARTICLE.partition("{article}")
+_WITH_ARTICLE_MIDDLE, _, _WITH_ARTICLE_TAIL = _rest.partition("{name}")
+_WITHOUT_ARTICLE_HEAD, _, _WITHOUT_ARTICLE_TAIL = PROMPT_TEMPLATE_WITHOUT_ARTICLE.partition("{name}")
+
+# Several rows in one request: the instructions are sent once for the whole list
+PROMPT_TEMPLATE_BATCH = """Ты специалист по автозапчастям и маркетолог. Для каждого товара из списка напиши отдельное описание.
+
+Товары:
+{items}
+
+Задача для каждого товара:
+1. Напиши структурированное HTML-описание (h2/h3/p/ul/li/strong) на русском языке.
+2. Сделай акцент на назначении запчасти, преимуществах, совместимости и установке.
+3. Укажи артикул (если он есть) и ключевые выгоды.
+4. Объём 90–140 слов. Не добавляй произвольные цены и ссылки.
+"""
+
+BATCH_RESPONSE_FORMAT = (
+    'Ответ строго в JSON без пояснений: {"items":[{"i":0,"html":"..."}, ...]} — '
+    "по одному элементу на каждый товар, i — номер товара из списка."
+)
+BATCH_ITEM_HTML_RE = re.compile(r'"i"\s*:\s*(\d+)\s*,\s*"html"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+CUSTOM_PROMPT_PLACEHOLDER_RE = re.compile(r"\{(article|name)\}")
+
+# Opening fence with any language tag, or the closing fence
+CODE_FENCE_RE = re.compile(r"\A\s*```[a-zA-Z]*\s*|\s*```\s*\Z")
+CYRILLIC_RE = re.compile(r"[А-Яа-яЁё]")
+# Cyrillic (Russian) or Latin with diacritics (Polish)
+VALID_TEXT_CHARS_RE = re.compile(r"[А-Яа-яЁёĄąĆćĘęŁłŃńÓóŚśŹźŻż]")
+# Default prompts demand Russian; a stream with no Cyrillic this far in is aborted
+LANGUAGE_CHECK_CHARS = 256
+
+MAX_RETRY_DELAY = 60.0
+
+GROQ_MODELS = ["openai/gpt-oss-120b", "openai/gpt-oss-20b", "llama-3.3-70b-versatile"]
+MAX_COMPLETION_TOKENS = 900
+# Completion tokens reserved per description before a request: a typical reply, not the
+# MAX_COMPLETION_TOKENS ceiling; the reported usage settles the difference afterwards
+EXPECTED_COMPLETION_TOKENS = 450
+
+# (requests per minute, tokens per minute) of the Groq free tier;
+# GROQ_RPM / GROQ_TPM override them for every model on paid plans
+MODEL_RATE_LIMITS = {
+    "openai/gpt-oss-120b": (30, 8_000),
+    "openai/gpt-oss-20b": (30, 8_000),
+    "llama-3.3-70b-versatile": (30, 12_000),
+}
+
+
+def _model_rate_limit(model: str) -> Tuple[int, int]:
+    rpm, tpm = MODEL_RATE_LIMITS.get(model, (30, 8_000))
+    return int(os.getenv("GROQ_RPM", rpm)), int(os.getenv("GROQ_TPM", tpm))
+
+
+def _retry_after_header(headers, default: float) -> float:
+    """Seconds from a Retry-After header, never less than `default`."""
+    try:
+        return max(default, float(headers.get("retry-after", default)))
+    except (TypeError, ValueError):
+        return default
+
+
+def _retry_after_seconds(exc: GroqError, default: float) -> float:
+    # Only API status errors carry a response; connection errors fall back to `default`
+    response = getattr(exc, "response", None)
+    if response is None:
+        return default
+    return _retry_after_header(response.headers, default)
+
+
+# OpenRouter answers worth retrying: rate limit and transient upstream failures
+OPENROUTER_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class InvalidResponseError(RuntimeError):
+    """The model answered, but the text is empty or not usable; worth a retry."""
+
+
+class AsyncTokenBucket:
+    """Proactive RPM + TPM limiter for one model.
+
+    Waits before a request instead of letting the API reject it. A request
+    reserves an estimate of its tokens and `settle()`s it against the usage the
+    API reports. A 429 pauses the bucket for Retry-After and halves its rates;
+    every success recovers them additively toward the configured maximum (AIMD).
+    """
+
+    def __init__(self, rpm: int, tpm: int):
+        self.max_rpm = max(1, rpm)
+        self.max_tpm = max(1, tpm)
+        self.rpm = float(self.max_rpm)
+        self.tpm = float(self.max_tpm)
+        self._requests = self.rpm
+        self._tokens = self.tpm
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+
+    async def acquire(self, tokens: int) -> int:
+        """Wait for capacity and reserve it; returns the number of tokens reserved."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                # A single request larger than the whole bucket only waits for a full bucket
+                needed = min(tokens, self.tpm)
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if self._requests >= 1 and self._tokens >= needed:
+                        self._requests -= 1
+                        self._tokens -= needed
+                        return needed
+                    wait = max(
+                        (1 - self._requests) * 60 / self.rpm,
+                        (needed - self._tokens) * 60 / self.tpm,
+                    )
+                await asyncio.sleep(wait)
+
+    def settle(self, reserved: int, used: int) -> None:
+        # May go negative when a reply ran long; later requests then wait it off
+        self._tokens = min(self.tpm, self._tokens + reserved - used)
+
+    def penalize(self, seconds: float) -> None:
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self.rpm = max(1.0, self.rpm / 2)
+        self.tpm = max(1.0, self.tpm / 2)
+        self._requests = min(self._requests, self.rpm)
+        self._tokens = min(self._tokens, self.tpm)
+
+    def record_success(self) -> None:
+        self.rpm = min(float(self.max_rpm), self.rpm + 1)
+        self.tpm = min(float(self.max_tpm), self.tpm + self.max_tpm / self.max_rpm)
+
+
+class CircuitBreaker:
+    """Skips a model after `fail_threshold` consecutive failures.
+
+    Once `reset_after` seconds have passed, a single request is let through as
+    a probe; its success closes the breaker, its failure opens it again. A probe
+    that ends any other way (an invalid reply, cancellation) must `release()` so
+    the next caller can probe instead.
+    """
+
+    def __init__(self, fail_threshold: int = 3, reset_after: float = 60.0):
+        self.fail_threshold = fail_threshold
+        self.reset_after = reset_after
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self._probing or time.monotonic() - self.opened_at < self.reset_after:
+            return False
+        self._probing = True
+        return True
+
+    def record_failure(self) -> None:
+        self.consecutive_failures += 1
+        self._probing = False
+        if self.consecutive_failures >= self.fail_threshold:
+            self.opened_at = time.monotonic()
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def release(self) -> None:
+        self._probing = False
+
+
+# Bump when the templates or system messages change so cached texts are regenerated
+PROMPT_VERSION = "1"
+# Words of a name / characters of an article that survive normalization for fuzzy cache keys
+FUZZY_TOKEN_RE = re.compile(r"[0-9a-zа-я]+")
+DEFAULT_CACHE_PATH = os.environ.get("DESCRIPTION_CACHE_PATH", ".desc_cache.sqlite")
+
+
+class DescriptionCache:
+    """On-disk store of generated descriptions keyed by a hash of the prompt.
+
+    Also remembers worksheet header rows so a run can skip reading them again.
+    """
+
+    def __init__(self, path: str, timeout: float = 1.0):
+        self.logger = logging.getLogger("generate_descriptions")
+        # Autocommit: every write is its own short transaction, so parallel jobs and the
+        # web preview sharing this file never wait on another connection's open write.
+        # Header lookups happen on the Sheets worker thread, never concurrently with the loop's use
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        try:
+            # Readers no longer block the writer (and vice versa)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.Error:
+            pass
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (k TEXT PRIMARY KEY, v TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS headers (k TEXT PRIMARY KEY, v TEXT NOT NULL)")
+
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def key(prompt: str) -> str:
+        return hashlib.blake2b(f"{PROMPT_VERSION}|{prompt}".encode("utf-8"), digest_size=16).hexdigest()
+
+    # A cache failure (e.g. the file is locked by another job for too long) only costs
+    # a miss or a lost write; it never stops generation
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            row = self._conn.execute("SELECT v FROM cache WHERE k = ?", (key,)).fetchone()
+        except sqlite3.Error as exc:
+            self.logger.warning("⚠️ Кэш описаний недоступен: %s", exc)
+            return None
+        return row[0] if row else None
+
+    def put(self, key: str, value: str) -> None:
+        try:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (k, v, created) VALUES (?, ?, ?)", (key, value, time.time())
+            )
+        except sqlite3.Error as exc:
+            self.logger.warning("⚠️ Не удалось сохранить описание в кэш: %s", exc)
+
+    def get_header(self, key: str) -> Optional[List[str]]:
+        try:
+            row = self._conn.execute("SELECT v FROM headers WHERE k = ?", (key,)).fetchone()
+        except sqlite3.Error as exc:
+            self.logger.warning("⚠️ Кэш заголовков недоступен: %s", exc)
+            return None
+        return json.loads(row[0]) if row else None
+
+    def put_header(self, key: str, header: List[str]) -> None:
+        try:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO headers (k, v) VALUES (?, ?)", (key, json.dumps(header, ensure_ascii=False))
+            )
+        except sqlite3.Error as exc:
+            self.logger.warning("⚠️ Не удалось сохранить заголовки в кэш: %s", exc)
+
+    def close(self) -> None:
+        try:
+            self._conn.close()
+        except sqlite3.Error:
+            pass
+
+
+@functools.lru_cache(maxsize=4096)
+def _render_prompt(custom_prompt: Optional[str], article: str, name: str) -> str:
+    """Prompt text for one row; memoized because batch fallbacks and cache keys rebuild it."""
+    # Use custom prompt if provided: only {article} and {name} are substituted,
+    # any other braces in the user's text are left untouched
+    if custom_prompt:
+        values = {"article": article, "name": name}
+        return CUSTOM_PROMPT_PLACEHOLDER_RE.sub(lambda match: values[match.group(1)], custom_prompt)
+
+    # Use default templates
+    if article:
+        return _WITH_ARTICLE_HEAD + article + _WITH_ARTICLE_MIDDLE + name + _WITH_ARTICLE_TAIL
+    else:
+        return _WITHOUT_ARTICLE_HEAD + name + _WITHOUT_ARTICLE_TAIL
+
+
+def _strip_code_fence(text: str) -> str:
+    """Remove a markdown code fence (```html, ```HTML, bare ```) around the reply."""
+    return CODE_FENCE_RE.sub("", text).strip()
+
+
+def header_cache_key(sheet_id: str, worksheet_name: str, header_row: int) -> str:
+    return f"{sheet_id}|{worksheet_name}|{header_row}"
+
+
+def remember_header(
+    sheet_id: str, worksheet_name: str, header_row: int, header: List[str], cache_path: str = DEFAULT_CACHE_PATH
+) -> None:
+    """Store a header row read elsewhere (e.g. the web preview) so the next run can skip reading it."""
+    # Called from a request thread: skip the write rather than stall the response behind a busy job
+    cache = DescriptionCache(cache_path, timeout=0.1)
+    try:
+        cache.put_header(header_cache_key(sheet_id, worksheet_name, header_row), header)
+    finally:
+        cache.close()
+
+
+def _normalize_header(header: List[str]) -> List[str]:
+    names = [name.strip() for name in header]
+    while names and not names[-1]:
+        names.pop()
+    return names
+
 
 @dataclass
 class SheetColumns:
@@ -85,6 +469,12 @@ class DescriptionGenerator:
         max_retries: int = 3,
         retry_delay: float = 2.0,
         log_level: str = "INFO",
+        concurrency: int = 8,
+        batch_size: int = 1,
+        write_batch_size: int = 25,
+        use_cache: bool = True,
+        fuzzy_cache: bool = False,
+        cache_path: str = DEFAULT_CACHE_PATH,
     ):
         load_dotenv()
         self.sheet_id = self._normalize_sheet_id(sheet_id)
@@ -94,35 +484,118 @@ class DescriptionGenerator:
         self.name_column = name_column
         self.description_column = description_column
         self.custom_prompt = custom_prompt
+        # System message - use generic if custom prompt, otherwise Russian-specific
+        self._system_msg = SYSTEM_MSG_CUSTOM if custom_prompt else SYSTEM_MSG_RUSSIAN
+        self._retry_msg = RETRY_MSG if custom_prompt else RETRY_MSG + " Используй русский язык."
+        self._retry_message = {"role": "user", "content": self._retry_msg}
         self.force = force
         self.dry_run = dry_run
         self.max_retries = max_retries
         self.retry_delay = retry_delay
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        # Cleared after a failed batch request: later chunks go straight to per-item calls
+        self._batching = True
+        self.write_batch_size = max(1, write_batch_size)
+        self.fuzzy_cache = fuzzy_cache
+        # Shared by all concurrent rows so the whole run stays under each model's limits
+        self.rate_limiters = {
+            model: AsyncTokenBucket(*_model_rate_limit(model)) for model in GROQ_MODELS
+        }
+        self.breakers = {model: CircuitBreaker() for model in GROQ_MODELS}
+        self.openrouter_breaker = CircuitBreaker()
 
-        logging.basicConfig(
-            level=getattr(logging, log_level.upper(), logging.INFO),
-            format="%(asctime)s | %(levelname)s | %(message)s",
-        )
+        level = getattr(logging, log_level.upper(), logging.INFO)
+        # Timestamps help follow a verbose run; for warnings only they are just per-record overhead
+        log_format = "%(asctime)s | %(levelname)s | %(message)s" if level <= logging.INFO else "%(levelname)s | %(message)s"
+        logging.basicConfig(level=level, format=log_format)
         self.logger = logging.getLogger("generate_descriptions")
 
-        self.client = self._init_llm_client()
-        self.sheet = self._init_sheet()
-        self.columns = self._resolve_columns()
+        # Resources close() releases; set up front so a failure below can release what exists
+        self.cache: Optional[DescriptionCache] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.client: Optional[AsyncGroq] = None
+        self.openrouter_client: Optional[httpx.AsyncClient] = None
+        self._sheet_pool: Optional[ThreadPoolExecutor] = None
+        try:
+            self.cache = DescriptionCache(cache_path) if use_cache else None
+            # The async Groq client's connection pool is bound to the loop it runs on,
+            # so every call made through this generator uses the same loop
+            self._loop = new_event_loop()
+            self.client = self._init_llm_client()
+            # Kept open for the whole run so repeated fallbacks reuse the TLS connection
+            self.openrouter_client = httpx.AsyncClient(
+                base_url="https://openrouter.ai/api/v1",
+                headers=self._openrouter_headers(),
+                timeout=60,
+                # With an explicit transport the client ignores its own limits/http2 arguments
+                transport=httpx.AsyncHTTPTransport(
+                    retries=3,
+                    http2=HTTP2_AVAILABLE,
+                    limits=httpx.Limits(max_connections=16, max_keepalive_connections=4),
+                ),
+            )
+            # gspread is blocking; one worker keeps Sheets calls ordered and off the event loop
+            self._sheet_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sheets")
+            self.sheet = self._init_sheet()
+            # True while self.columns come from a cached header that the next read must confirm
+            self._header_unverified = False
+            self.columns = self._resolve_columns()
+        except BaseException:
+            # The caller never gets the instance, so nobody else could close these
+            self.close()
+            raise
+
+    def run(self, coroutine):
+        """Run a coroutine on the generator's event loop and return its result."""
+        return self._loop.run_until_complete(coroutine)
+
+    def close(self) -> None:
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+        if self._loop is not None and not self._loop.is_closed():
+            # A non-RuntimeError escaping process_async leaves sibling row tasks pending
+            pending = asyncio.all_tasks(self._loop)
+            for task in pending:
+                task.cancel()
+            if pending:
+                self.run(asyncio.gather(*pending, return_exceptions=True))
+            if self.client is not None:
+                self.run(self.client.close())
+            if self.openrouter_client is not None:
+                self.run(self.openrouter_client.aclose())
+            self._loop.close()
+        if self._sheet_pool is not None:
+            self._sheet_pool.shutdown(wait=True)
+            self._sheet_pool = None
 
     @staticmethod
     def _normalize_sheet_id(sheet_input: str) -> str:
         if not sheet_input:
             raise RuntimeError("Не указан ID таблицы или ссылка на Google Sheets.")
-        if "spreadsheets/d/" in sheet_input:
-            return sheet_input.split("/d/")[1].split("/")[0]
-        return sheet_input
+        return extract_sheet_id(sheet_input)
 
-    def _init_llm_client(self) -> Groq:
+    @staticmethod
+    def _openrouter_headers() -> Dict[str, str]:
+        """Headers sent with every OpenRouter request; no Authorization without a key."""
+        headers = {
+            "Content-Type": "application/json",
+            "HTTP-Referer": os.getenv("OPENROUTER_REFERER", "https://github.com/user/generate_description"),
+            "X-Title": os.getenv("OPENROUTER_APP_TITLE", "Description Generator"),
+        }
+        api_key = os.getenv("OPENROUTER_API_KEY")
+        if api_key:
+            headers["Authorization"] = f"Bearer {api_key}"
+        return headers
+
+    def _init_llm_client(self) -> AsyncGroq:
         api_key = os.getenv("GROQ_API_KEY") or os.getenv("QROQ_TOKEN")
         if not api_key:
             raise RuntimeError("В .env отсутствует GROQ_API_KEY или QROQ_TOKEN")
 
-        client = Groq(api_key=api_key)
+        # HTTP/2 multiplexes the concurrent completions over one TLS connection
+        client = AsyncGroq(api_key=api_key, http_client=DefaultAsyncHttpxClient(http2=HTTP2_AVAILABLE))
         self.logger.info("Используется Groq модель 'openai/gpt-oss-120b'")
         return client
 
@@ -134,19 +607,37 @@ class DescriptionGenerator:
                 "Укажите GOOGLE_CREDENTIALS_JSON/GOOGLE_CREDENTIALS_BASE64 в Railway."
             )
 
-        scopes = [
-            "https://www.googleapis.com/auth/spreadsheets",
-            "https://www.googleapis.com/auth/drive",
-        ]
-
-        creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=scopes)
-        gc = gspread.authorize(creds)
-        spreadsheet = gc.open_by_key(self.sheet_id)
-        return spreadsheet.worksheet(self.worksheet_name)
-
-    def _resolve_columns(self) -> SheetColumns:
-        # Get header row (convert to 1-based for gspread)
-        header = self.sheet.row_values(self.header_row)
+        return open_worksheet(gspread_client(SERVICE_ACCOUNT_FILE), self.sheet_id, self.worksheet_name)
+
+    @property
+    def _header_cache_key(self) -> str:
+        return header_cache_key(self.sheet_id, self.worksheet_name, self.header_row)
+
+    def _cached_header(self) -> Optional[List[str]]:
+        """Return the remembered header if it already has every column we need.
+
+        A cached header is never used when a column would have to be created:
+        that writes to the sheet and must see its current state.
+        """
+        if self.cache is None:
+            return None
+        header = self.cache.get_header(self._header_cache_key)
+        if header is None:
+            return None
+        names = {name.strip() for name in header}
+        if self.name_column not in names or not self.description_column or self.description_column not in names:
+            return None
+        return header
+
+    def _resolve_columns(self, header: Optional[List[str]] = None) -> SheetColumns:
+        if header is None:
+            header = self._cached_header()
+            self._header_unverified = header is not None
+        if header is None:
+            # Get header row (convert to 1-based for gspread)
+            header = self.sheet.row_values(self.header_row)
+            if self.cache is not None:
+                self.cache.put_header(self._header_cache_key, header)
         header_map: Dict[str, int] = {name.strip(): idx + 1 for idx, name in enumerate(header)}
 
         # Find article and name columns (article is optional)
@@ -155,8 +646,9 @@ class DescriptionGenerator:
             article_col = header_map.get(self.article_column)
             if not article_col:
                 self.logger.warning(
-                    f"Колонка '{self.article_column}' не найдена в строке {self.header_row}. "
-                    "Продолжаю без артикула."
+                    "Колонка '%s' не найдена в строке %s. Продолжаю без артикула.",
+                    self.article_column,
+                    self.header_row,
                 )
         
         name_col = header_map.get(self.name_column)
@@ -183,7 +675,7 @@ class DescriptionGenerator:
                         # Use existing empty column
                         description_col = empty_col
                         self.sheet.update_cell(self.header_row, description_col, "Описание")
-                        self.logger.info(f"✅ Использована пустая колонка 'Описание' в позиции {description_col}")
+                        self.logger.info("✅ Использована пустая колонка 'Описание' в позиции %s", description_col)
                     else:
                         # Try to add a new column using add_cols
                         try:
@@ -193,7 +685,7 @@ class DescriptionGenerator:
                             self.sheet.add_cols(1)
                             description_col = current_cols + 1
                             self.sheet.update_cell(self.header_row, description_col, "Описание")
-                            self.logger.info(f"✅ Создана новая колонка 'Описание' в позиции {description_col}")
+                            self.logger.info("✅ Создана новая колонка 'Описание' в позиции %s", description_col)
                         except Exception as add_col_error:
                             # If add_cols fails (e.g., grid limits), raise a helpful error
                             error_msg = str(add_col_error)
@@ -227,187 +719,330 @@ class DescriptionGenerator:
             )
 
     def _build_prompt(self, article: str, name: str) -> str:
-        # Use custom prompt if provided
+        # article and name arrive already stripped from process_async
+        return _render_prompt(self.custom_prompt, article or "", name)
+
+    def _build_batch_prompt(self, items: List[Tuple[str, str]]) -> str:
         if self.custom_prompt:
+            blocks = [
+                f"Товар {i}:\n{self._build_prompt(article, name)}" for i, (article, name) in enumerate(items)
+            ]
+            return "\n\n".join(blocks) + "\n\n" + BATCH_RESPONSE_FORMAT
+
+        lines = []
+        for i, (article, name) in enumerate(items):
+            if article:
+                lines.append(f"{i}. Артикул: {article}; Наименование: {name}")
+            else:
+                lines.append(f"{i}. Наименование: {name}")
+        return PROMPT_TEMPLATE_BATCH.format(items="\n".join(lines)) + "\n" + BATCH_RESPONSE_FORMAT
+
+    @staticmethod
+    def _parse_batch_response(text: str) -> Dict[int, str]:
+        """Map item number to HTML; tolerates code fences and broken JSON around the items."""
+        start, end = text.find("{"), text.rfind("}")
+        try:
+            data = json.loads(text[start:end + 1])
+            return {
+                int(item["i"]): str(item["html"])
+                for item in data["items"]
+                if isinstance(item, dict) and "i" in item and "html" in item
+            }
+        except (ValueError, KeyError, TypeError):
+            pass
+
+        parsed: Dict[int, str] = {}
+        for number, raw in BATCH_ITEM_HTML_RE.findall(text):
             try:
-                # Try to format with both article and name
-                if article and article.strip():
-                    return self.custom_prompt.format(article=article.strip(), name=name.strip())
-                else:
-                    # If no article, try with just name
-                    return self.custom_prompt.format(name=name.strip())
-            except KeyError:
-                # If format fails (e.g., prompt doesn't have {article} or {name}), use as-is
-                return self.custom_prompt
-        
-        # Use default templates
-        if article and article.strip():
-            return PROMPT_TEMPLATE_WITH_ARTICLE.format(article=article.strip(), name=name.strip())
-        else:
-            return PROMPT_TEMPLATE_WITHOUT_ARTICLE.format(name=name.strip())
+                parsed[int(number)] = json.loads(f'"{raw}"')
+            except ValueError:
+                continue
+        return parsed
 
     def _is_valid_text(self, text: str) -> bool:
         """Check if text contains valid content (Russian, Polish, or other non-ASCII characters)"""
-        if not text or not text.strip():
-            return False
-        # Check for Cyrillic (Russian), Latin with diacritics (Polish), or other non-ASCII
-        return bool(re.search(r"[А-Яа-яЁёĄąĆćĘęŁłŃńÓóŚśŹźŻż]", text or "")) or len(text.strip()) > 10
+        stripped = text.strip() if text else ""
+        # Any real description is longer than 10 characters, so the regex rarely runs
+        return len(stripped) > 10 or VALID_TEXT_CHARS_RE.search(stripped) is not None
+
+    def _fuzzy_cache_key(self, article: str, name: str) -> str:
+        """Key that ignores case, punctuation and word order, e.g. 'ABC-12' == 'abc 12'."""
+        words = FUZZY_TOKEN_RE.findall(name.lower().replace("ё", "е"))
+        article_chars = "".join(FUZZY_TOKEN_RE.findall(article.lower()))
+        return DescriptionCache.key(f"fuzzy|{self.custom_prompt or ''}|{article_chars}|{' '.join(sorted(words))}")
+
+    def _cache_lookup(self, article: str, name: str, prompt: str) -> Optional[str]:
+        # --force asks for fresh texts; they still refresh the cache via _cache_store
+        if self.cache is None or self.force:
+            return None
+        text = self.cache.get(DescriptionCache.key(prompt))
+        if text is not None:
+            self.logger.info("♻️ Описание взято из кэша.")
+            return text
+        if self.fuzzy_cache:
+            text = self.cache.get(self._fuzzy_cache_key(article, name))
+            if text is not None:
+                self.logger.info("♻️ Описание взято из кэша (похожий товар).")
+        return text
 
-    def _generate_description(self, article: str, name: str) -> str:
+    def _cache_store(self, article: str, name: str, prompt: str, text: str) -> None:
+        if self.cache is None:
+            return
+        self.cache.put(DescriptionCache.key(prompt), text)
+        self.cache.put(self._fuzzy_cache_key(article, name), text)
+
+    async def _generate_description(self, article: str, name: str) -> str:
         prompt = self._build_prompt(article, name)
-        models = ["openai/gpt-oss-120b", "openai/gpt-oss-20b", "llama-3.3-70b-versatile"]
+        cached = self._cache_lookup(article, name, prompt)
+        if cached is not None:
+            return cached
+        text = await self._request_description(prompt, article)
+        self._cache_store(article, name, prompt, text)
+        return text
+
+    async def _read_russian_stream(self, completion) -> Tuple[str, Optional[object]]:
+        """Collect a streamed reply and its usage, closing it early if no Cyrillic shows up."""
+        buf = io.StringIO()
+        check_language = True
+        usage = None
+        async for chunk in completion:
+            # Groq reports token usage on the last chunk
+            x_groq = getattr(chunk, "x_groq", None)
+            if x_groq is not None and x_groq.usage is not None:
+                usage = x_groq.usage
+            if not chunk.choices:
+                continue
+            # Groq's ChoiceDelta.content is Optional[str]
+            content = chunk.choices[0].delta.content
+            if not content:
+                continue
+            buf.write(content)
+            if check_language:
+                if CYRILLIC_RE.search(content):
+                    check_language = False
+                elif buf.tell() >= LANGUAGE_CHECK_CHARS:
+                    await completion.close()
+                    raise InvalidResponseError("Ответ модели не на русском языке.")
+        return buf.getvalue().strip(), usage
+
+    async def _generate_descriptions_batch(
+        self, items: List[Tuple[str, str]]
+    ) -> List[Union[str, RuntimeError]]:
+        """Generate descriptions for several (article, name) pairs with one LLM request.
+
+        Cached items are not sent; items the model skipped or mangled are
+        generated one by one, concurrently (the token buckets still pace them).
+        An item that still fails gets its RuntimeError in place of the text, so
+        the rest of the batch is kept.
+        """
+        prompts = [self._build_prompt(article, name) for article, name in items]
+        results: List[Union[str, RuntimeError, None]] = [
+            self._cache_lookup(article, name, prompt) for (article, name), prompt in zip(items, prompts)
+        ]
+
+        missing = [i for i, text in enumerate(results) if text is None]
+        if len(missing) > 1 and self._batching:
+            batch_prompt = self._build_batch_prompt([items[i] for i in missing])
+            try:
+                response = await self._request_description(
+                    batch_prompt, items[missing[0]][0], max_tokens=MAX_COMPLETION_TOKENS * len(missing)
+                )
+                parsed = self._parse_batch_response(response)
+            except RuntimeError as exc:
+                self.logger.warning("Пакетный запрос не удался (%s), дальше генерирую по одному.", exc)
+                self._batching = False
+                parsed = {}
+            for number, i in enumerate(missing):
+                text = _strip_code_fence(parsed.get(number, ""))
+                if text and self._is_valid_text(text):
+                    results[i] = text
+                    self._cache_store(*items[i], prompts[i], text)
+
+        retry = [i for i, text in enumerate(results) if text is None]
+        texts = await asyncio.gather(
+            *(self._generate_description(*items[i]) for i in retry), return_exceptions=True
+        )
+        for i, text in zip(retry, texts):
+            if isinstance(text, BaseException) and not isinstance(text, RuntimeError):
+                raise text
+            results[i] = text
+        return results
+
+    async def _request_description(
+        self, prompt: str, article: str, max_tokens: int = MAX_COMPLETION_TOKENS
+    ) -> str:
+        models = GROQ_MODELS
         last_error: Optional[Exception] = None
         
+        # Built once per prompt; the SDK only reads them, so they are shared by all attempts
+        first_messages = [
+            {"role": "system", "content": self._system_msg},
+            {"role": "user", "content": prompt},
+        ]
+        retry_messages = first_messages + [self._retry_message]
+
         for model_idx, model_name in enumerate(models):
+            breaker = self.breakers[model_name]
+            probing = breaker.is_open
+            if not breaker.allow():
+                self.logger.info("Модель %s пропущена: слишком много ошибок подряд.", model_name)
+                continue
             self.logger.info("Попытка использования модели: %s", model_name)
 
-            for attempt in range(1, self.max_retries + 1):
-                try:
-                    self.logger.debug("LLM request attempt %s for article %s with model %s", attempt, article, model_name)
-                    # System message - use generic if custom prompt, otherwise Russian-specific
-                    if self.custom_prompt:
-                        system_msg = "Ты пишешь продающие описания автозапчастей. Следуй инструкциям в промпте."
-                    else:
-                        system_msg = "Ты пишешь продающие описания автозапчастей. Используй только русский язык."
-                    
-                    messages = [
-                        {"role": "system", "content": system_msg},
-                        {"role": "user", "content": prompt},
-                    ]
-                    if attempt > 1:
-                        retry_msg = "Предыдущий ответ был пустой или некорректный. Сейчас обязательно верни развёрнутое описание."
-                        if not self.custom_prompt:
-                            retry_msg += " Используй русский язык."
-                        messages.append(
-                            {
-                                "role": "user",
-                                "content": retry_msg,
-                            }
-                        )
-
-                    completion = self.client.chat.completions.create(
-                        model=model_name,
-                        messages=messages,
-                        temperature=0.4,
-                        max_completion_tokens=900,
-                        top_p=1,
-                        stream=True,
-                    )
-                    parts: List[str] = []
+            try:
+                for attempt in range(1, self.max_retries + 1):
+                    retry_wait = 0.0
                     try:
-                        for chunk in completion:
-                            delta = chunk.choices[0].delta
-                            if not delta:
-                                continue
-                            content = getattr(delta, "content", None)
-                            if not content:
-                                continue
-
-                            if isinstance(content, list):
-                                for piece in content:
-                                    if isinstance(piece, str):
-                                        parts.append(piece)
-                                    elif isinstance(piece, dict) and piece.get("type") == "text":
-                                        parts.append(piece.get("text", ""))
-                            elif isinstance(content, str):
-                                parts.append(content)
-                    except GeneratorExit:
-                        self.logger.debug("Поток завершён (GeneratorExit) для %s", article)
-
-                    text = "".join(parts).strip()
-                    # Remove markdown code block formatting if present
-                    text = text.removeprefix("```html").removesuffix("```").strip()
-                    if not text or not self._is_valid_text(text):
-                        raise RuntimeError("Пустой или некорректный ответ модели.")
+                        self.logger.debug("LLM request attempt %s for article %s with model %s", attempt, article, model_name)
+                        messages = first_messages if attempt == 1 else retry_messages
+
+                        limiter = self.rate_limiters[model_name]
+                        # A batch of n descriptions asks for n * MAX_COMPLETION_TOKENS
+                        expected = EXPECTED_COMPLETION_TOKENS * max(1, max_tokens // MAX_COMPLETION_TOKENS)
+                        reserved = await limiter.acquire(len(prompt) // 4 + min(max_tokens, expected))
+                        # Streaming only pays off when the language check can abort a reply early
+                        stream = not self.custom_prompt
+                        completion = await self.client.chat.completions.create(
+                            model=model_name,
+                            messages=messages,
+                            temperature=0.4,
+                            max_completion_tokens=max_tokens,
+                            top_p=1,
+                            stream=stream,
+                        )
+                        if stream:
+                            text, usage = await self._read_russian_stream(completion)
+                        else:
+                            text = (completion.choices[0].message.content or "").strip()
+                            usage = completion.usage
+                        if usage is not None:
+                            limiter.settle(reserved, usage.total_tokens)
+                        # Remove markdown code block formatting if present
+                        text = _strip_code_fence(text)
+                        if not text or not self._is_valid_text(text):
+                            raise InvalidResponseError("Пустой или некорректный ответ модели.")
                     
-                    self.logger.info("✅ Успешно сгенерировано с использованием модели: %s", model_name)
-                    return text
-
-                except GroqError as exc:
-                    last_error = exc
-                    self.logger.warning("GroqError (%s/%s, модель %s): %s", attempt, self.max_retries, model_name, exc)
-                except Exception as exc:  # noqa: BLE001
-                    last_error = exc
-                    self.logger.exception("Неожиданная ошибка LLM (%s/%s, модель %s): %s", attempt, self.max_retries, model_name, exc)
-                    break
-
-                if attempt < self.max_retries:
-                    time.sleep(self.retry_delay)
+                        limiter.record_success()
+                        breaker.record_success()
+                        self.logger.info("✅ Успешно сгенерировано с использованием модели: %s", model_name)
+                        return text
+
+                    except RateLimitError as exc:
+                        last_error = exc
+                        retry_after = _retry_after_seconds(exc, self.retry_delay)
+                        self.rate_limiters[model_name].penalize(retry_after)
+                        breaker.record_failure()
+                        self.logger.warning(
+                            "Лимит запросов (%s/%s, модель %s), пауза %.1f c: %s",
+                            attempt, self.max_retries, model_name, retry_after, exc,
+                        )
+                    except InvalidResponseError as exc:
+                        last_error = exc
+                        self.logger.warning("%s (%s/%s, модель %s)", exc, attempt, self.max_retries, model_name)
+                    except GroqError as exc:
+                        last_error = exc
+                        retry_wait = _retry_after_seconds(exc, 0.0)
+                        self.logger.warning("GroqError (%s/%s, модель %s): %s", attempt, self.max_retries, model_name, exc)
+                        breaker.record_failure()
+                    except Exception as exc:  # noqa: BLE001
+                        last_error = exc
+                        breaker.record_failure()
+                        self.logger.exception("Неожиданная ошибка LLM (%s/%s, модель %s): %s", attempt, self.max_retries, model_name, exc)
+                        break
+
+                    # Other rows already tripped this model; don't spend the remaining retries on it
+                    if breaker.is_open:
+                        break
+                    if attempt < self.max_retries:
+                        # A server-sent Retry-After (e.g. on 503) wins over our own backoff
+                        await asyncio.sleep(max(min(retry_wait, MAX_RETRY_DELAY), self._backoff_delay(attempt)))
+            finally:
+                # An invalid reply or a cancelled request says nothing about the model's health,
+                # but the probe slot must not stay taken
+                if probing:
+                    breaker.release()
 
             if model_idx < len(models) - 1:
                 self.logger.warning("Модель %s не сработала, пробую следующую модель...", model_name)
-                time.sleep(self.retry_delay)
-            else:
-                self.logger.warning(
-                    "Все модели Groq (%s) не ответили (последняя ошибка: %s). "
-                    "Пробую DeepSeek через OpenRouter...",
-                    ", ".join(models),
-                    last_error,
-                )
-                return self._generate_with_openrouter(prompt)
+                await asyncio.sleep(self.retry_delay)
 
-        raise RuntimeError("Не удалось получить ответ от LLM")
+        self.logger.warning(
+            "Все модели Groq (%s) не ответили (последняя ошибка: %s). "
+            "Пробую DeepSeek через OpenRouter...",
+            ", ".join(models),
+            last_error,
+        )
+        # Without a key the error below explains the problem better than a skipped fallback
+        has_key = "Authorization" in self.openrouter_client.headers
+        probing = has_key and self.openrouter_breaker.is_open
+        if has_key and not self.openrouter_breaker.allow():
+            raise RuntimeError("OpenRouter временно пропущен: слишком много ошибок подряд.")
+        try:
+            text = await self._generate_with_openrouter(prompt, max_tokens)
+        except RuntimeError:
+            self.openrouter_breaker.record_failure()
+            raise
+        finally:
+            if probing:
+                self.openrouter_breaker.release()
+        self.openrouter_breaker.record_success()
+        return text
 
-    def _generate_with_openrouter(self, prompt: str) -> str:
-        api_key = os.getenv("OPENROUTER_API_KEY")
-        if not api_key:
+    def _backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff with jitter, so rows failing together don't retry together."""
+        return min(MAX_RETRY_DELAY, self.retry_delay * 2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+
+    async def _generate_with_openrouter(self, prompt: str, max_tokens: int = MAX_COMPLETION_TOKENS) -> str:
+        if "Authorization" not in self.openrouter_client.headers:
             raise RuntimeError(
                 "Не удалось получить ответ от Groq и не указан OpenRouter API ключ "
                 "(переменная окружения OPENROUTER_API_KEY)."
             )
 
-        referer = os.getenv("OPENROUTER_REFERER", "https://github.com/user/generate_description")
-        app_title = os.getenv("OPENROUTER_APP_TITLE", "Description Generator")
-
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {api_key}",
-            "HTTP-Referer": referer,
-            "X-Title": app_title,
-        }
-
-        # System message - use generic if custom prompt, otherwise Russian-specific
-        if self.custom_prompt:
-            system_msg = "Ты пишешь продающие описания автозапчастей. Следуй инструкциям в промпте."
-        else:
-            system_msg = "Ты пишешь продающие описания автозапчастей. Используй только русский язык."
-        
         payload = {
             "model": "deepseek/deepseek-chat-v3.1",
             "messages": [
                 {
                     "role": "system",
-                    "content": system_msg,
+                    "content": self._system_msg,
                 },
                 {"role": "user", "content": prompt},
             ],
             "temperature": 0.4,
-            "max_tokens": 900,
+            "max_tokens": max_tokens,
         }
 
-        try:
-            response = requests.post(
-                "https://openrouter.ai/api/v1/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=60,
+        body = orjson.dumps(payload)
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                response = await self.openrouter_client.post("/chat/completions", content=body)
+            except httpx.HTTPError as exc:  # noqa: BLE001
+                raise RuntimeError(f"Ошибка запроса к OpenRouter: {exc}") from exc
+            if response.status_code not in OPENROUTER_RETRY_STATUSES or attempt == self.max_retries:
+                break
+            delay = min(MAX_RETRY_DELAY, _retry_after_header(response.headers, self._backoff_delay(attempt)))
+            self.logger.warning(
+                "OpenRouter вернул статус %s (%s/%s), повтор через %.1f c",
+                response.status_code, attempt, self.max_retries, delay,
             )
-        except requests.RequestException as exc:  # noqa: BLE001
-            raise RuntimeError(f"Ошибка запроса к OpenRouter: {exc}") from exc
+            await asyncio.sleep(delay)
 
         if response.status_code >= 400:
             raise RuntimeError(
                 f"OpenRouter вернул статус {response.status_code}: {response.text[:200]}"
             )
 
-        data = response.json()
+        try:
+            data = orjson.loads(response.content)
+        except orjson.JSONDecodeError as exc:
+            raise RuntimeError(f"OpenRouter вернул некорректный JSON: {exc}") from exc
         choices = data.get("choices") or []
         if not choices:
             raise RuntimeError("OpenRouter вернул пустой список choices.")
 
         message = choices[0].get("message") or {}
         text = (message.get("content") or "").strip()
-        text = text.removeprefix("```html").removesuffix("```").strip()
+        text = _strip_code_fence(text)
 
         if not text or not self._is_valid_text(text):
             raise RuntimeError("OpenRouter/DeepSeek вернул пустой или некорректный ответ.")
@@ -421,66 +1056,223 @@ class DescriptionGenerator:
         end_row: Optional[int] = None,
         limit: Optional[int] = None,
         sleep: float = 0.0,
+        stop_event: Optional[threading.Event] = None,
     ) -> int:
-        rows = self.sheet.get_all_values()
-        processed = 0
-        total_time = 0.0
-
-        for idx, row in enumerate(rows, start=1):
-            if idx < start_row:
-                continue
-            if end_row and idx > end_row:
-                break
-
-            article = ""
-            if self.columns.article:
-                article = row[self.columns.article - 1].strip() if len(row) >= self.columns.article else ""
-                
-            name = row[self.columns.name - 1].strip() if len(row) >= self.columns.name else ""
-            description = (
-                row[self.columns.description - 1].strip()
-                if len(row) >= self.columns.description
-                else ""
-            )
+        return self.run(self.process_async(start_row, end_row, limit, sleep, stop_event))
+
+    async def _sheet_call(self, func, *args, **kwargs):
+        """Run a blocking gspread call on the Sheets worker thread."""
+        # The web app routes log records by a context variable, so keep the caller's context
+        call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self._sheet_pool, call)
+
+    def _read_columns(
+        self, start_row: int, end_row: Optional[int]
+    ) -> Tuple[List[str], List[str], List[str]]:
+        """Fetch only the article, name and description cells of rows start_row..end_row.
+
+        When the columns were resolved from a cached header, the header row is
+        fetched in the same request and the read is redone if it has changed.
+        With --force every row is regenerated, so the (largest) description
+        column is not downloaded at all.
+        """
+        start_row = max(1, start_row)
+        columns = [self.columns.name]
+        if not self.force:
+            columns.append(self.columns.description)
+        if self.columns.article:
+            columns.append(self.columns.article)
+
+        ranges = []
+        for col in columns:
+            letter = rowcol_to_a1(1, col)[:-1]
+            ranges.append(f"{letter}{start_row}:{letter}{end_row or ''}")
+        verify_header = self._header_unverified
+        if verify_header:
+            ranges.append(f"{self.header_row}:{self.header_row}")
+
+        value_ranges = self.sheet.batch_get(ranges, major_dimension="COLUMNS")
+        if verify_header:
+            self._header_unverified = False
+            # Each column of a one-row range comes back as a single-value list
+            header = [column[0] if column else "" for column in value_ranges[-1]]
+            cached = self.cache.get_header(self._header_cache_key) if self.cache is not None else None
+            if _normalize_header(header) != _normalize_header(cached or []):
+                self.logger.info("Заголовки листа изменились, определяю колонки заново.")
+                self.cache.put_header(self._header_cache_key, header)
+                self.columns = self._resolve_columns(header)
+                return self._read_columns(start_row, end_row)
+
+        # COLUMNS major dimension returns each range as one flat list of values
+        values = [value_range[0] if value_range else [] for value_range in value_ranges]
+        names = values.pop(0)
+        descriptions = values.pop(0) if not self.force else []
+        articles = values.pop(0) if self.columns.article else []
+        return articles, names, descriptions
+
+    async def process_async(
+        self,
+        start_row: int = 2,
+        end_row: Optional[int] = None,
+        limit: Optional[int] = None,
+        sleep: float = 0.0,
+        stop_event: Optional[threading.Event] = None,
+    ) -> int:
+        """Generate descriptions for up to `concurrency` requests at a time.
+
+        Each request covers up to `batch_size` rows. A single writer task collects the results and stores them with one
+        `batch_update` per `write_batch_size` rows (and once more at the end).
+        """
+        articles, names, descriptions = await self._sheet_call(self._read_columns, start_row, end_row)
+        # Rows with the same article and name share one generated description; with the
+        # fuzzy cache on, so do rows it would treat as the same product ('ABC-12' == 'abc 12')
+        fuzzy = self.fuzzy_cache and not self.force
+        groups: Dict[object, Tuple[str, str, List[int]]] = {}
+
+        for offset, name in enumerate(names):
+            # Filled rows are usually the majority: reject them before any other work.
+            # Only tested for emptiness, so no stripped copy is needed
+            if not self.force and offset < len(descriptions):
+                description = descriptions[offset]
+                if description and not description.isspace():
+                    continue
 
+            name = name.strip()
             if not name:
                 continue
+            idx = start_row + offset
+            article = articles[offset].strip() if offset < len(articles) else ""
 
-            if description and not self.force:
-                continue
+            key = self._fuzzy_cache_key(article, name) if fuzzy else (article, name)
+            group = groups.get(key)
+            if group is None:
+                groups[key] = (article, name, [idx])
+            else:
+                group[2].append(idx)
 
-            log_info = f"🔧 Строка {idx} | {name}"
-            if article:
-                log_info = f"🔧 Строка {idx} | {article} | {name}"
-            self.logger.info(log_info)
-            request_start = time.perf_counter()
-            try:
-                text = self._generate_description(article, name)
-            except RuntimeError as exc:
-                self.logger.error("❌ Ошибка генерации для строки %s: %s", idx, exc)
-                continue
-            request_time = time.perf_counter() - request_start
-            total_time += request_time
+        pending = [(idxs, article, name) for article, name, idxs in groups.values()]
+        duplicates = sum(len(idxs) - 1 for idxs, _, _ in pending)
+        if duplicates:
+            self.logger.info("♻️ Повторяющихся строк: %s, для них описание генерируется один раз.", duplicates)
 
-            if self.dry_run:
-                self.logger.info("📝 (dry-run) %s", text[:100].replace("\n", " ") + "...")
-            else:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results: asyncio.Queue = asyncio.Queue()
+        processed = 0
+        reserved = 0  # rows generating, waiting to be written or written; bounds `limit`
+        stopped = False
+        total_time = 0.0
+
+        def should_skip(idx: int) -> bool:
+            nonlocal stopped
+            if stop_event is not None and stop_event.is_set():
+                if not stopped:
+                    stopped = True
+                    self.logger.warning("⏹️ Генерация остановлена на строке %s", idx)
+                return True
+            return bool(limit) and reserved >= limit
+
+        async def generate_rows(chunk: List[Tuple[List[int], str, str]]) -> None:
+            nonlocal reserved, total_time
+            async with semaphore:
+                if should_skip(chunk[0][0][0]):
+                    return
+                if limit:
+                    room = limit - reserved
+                    trimmed = []
+                    for idxs, article, name in chunk:
+                        if room <= 0:
+                            break
+                        trimmed.append((idxs[:room], article, name))
+                        room -= len(idxs[:room])
+                    chunk = trimmed
+                row_count = sum(len(idxs) for idxs, _, _ in chunk)
+                reserved += row_count
+
+                if self.logger.isEnabledFor(logging.INFO):
+                    for idxs, article, name in chunk:
+                        rows_label = ", ".join(str(idx) for idx in idxs)
+                        log_info = f"🔧 Строка {rows_label} | {name}"
+                        if article:
+                            log_info = f"🔧 Строка {rows_label} | {article} | {name}"
+                        self.logger.info(log_info)
+                request_start = time.perf_counter()
                 try:
-                    self.sheet.update_cell(idx, self.columns.description, text)
-                    self.logger.info("✅ Записано в Google Sheets.")
+                    if len(chunk) == 1:
+                        texts = [await self._generate_description(chunk[0][1], chunk[0][2])]
+                    else:
+                        texts = await self._generate_descriptions_batch(
+                            [(article, name) for _, article, name in chunk]
+                        )
+                except RuntimeError as exc:
+                    reserved -= row_count
+                    rows_failed = ", ".join(str(idx) for idxs, _, _ in chunk for idx in idxs)
+                    self.logger.error("❌ Ошибка генерации для строки %s: %s", rows_failed, exc)
+                    return
+                request_time = time.perf_counter() - request_start
+                total_time += request_time
+                self.logger.info("⏱️ Время запроса: %.2f c", request_time)
+                for (idxs, _, _), text in zip(chunk, texts):
+                    if isinstance(text, RuntimeError):
+                        reserved -= len(idxs)
+                        rows_failed = ", ".join(str(idx) for idx in idxs)
+                        self.logger.error("❌ Ошибка генерации для строки %s: %s", rows_failed, text)
+                        continue
+                    for idx in idxs:
+                        await results.put((idx, text))
+
+                if sleep:
+                    await asyncio.sleep(sleep)
+
+        async def write_results() -> None:
+            nonlocal processed, reserved
+            batch: List[Tuple[int, str]] = []
+            flush_at = self.write_batch_size
+
+            async def flush(final: bool = False) -> None:
+                nonlocal processed, reserved, flush_at
+                if not batch:
+                    return
+                letter = rowcol_to_a1(1, self.columns.description)[:-1]
+                data = [{"range": f"{letter}{idx}", "values": [[text]]} for idx, text in batch]
+                rows_written = ", ".join(str(idx) for idx, _ in batch)
+                try:
+                    await self._sheet_call(self.sheet.batch_update, data, value_input_option="RAW")
+                    processed += len(batch)
+                    self.logger.info("✅ Записано в Google Sheets: строки %s", rows_written)
                 except Exception as exc:  # noqa: BLE001
-                    self.logger.error("❌ Не удалось обновить строку %s: %s", idx, exc)
+                    if not final:
+                        # Keep the rows and try them again together with the next batch
+                        flush_at = len(batch) + self.write_batch_size
+                        self.logger.warning("⚠️ Не удалось обновить строки %s, повторю позже: %s", rows_written, exc)
+                        return
+                    reserved -= len(batch)
+                    self.logger.error("❌ Не удалось обновить строки %s: %s", rows_written, exc)
+                batch.clear()
+                flush_at = self.write_batch_size
+
+            while True:
+                item = await results.get()
+                if item is None:
+                    await flush(final=True)
+                    return
+                idx, text = item
+
+                if self.dry_run:
+                    self.logger.info("📝 (dry-run) %s", text[:100].replace("\n", " ") + "...")
+                    processed += 1
                     continue
 
-            self.logger.info("⏱️ Время запроса: %.2f c", request_time)
-
-            processed += 1
-
-            if limit and processed >= limit:
-                break
+                batch.append((idx, text))
+                if len(batch) >= flush_at:
+                    await flush()
 
-            if sleep:
-                time.sleep(sleep)
+        writer = asyncio.create_task(write_results())
+        try:
+            chunks = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+            await asyncio.gather(*(generate_rows(chunk) for chunk in chunks))
+        finally:
+            await results.put(None)
+            await writer
 
         if processed:
             avg = total_time / processed
@@ -503,10 +1295,19 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--force",
         action="store_true",
-        help="Перезаписывать уже заполненные описания.",
+        help="Перезаписывать уже заполненные описания (кэш при этом не читается, только обновляется)."
     )
     parser.add_argument("--dry-run", action="store_true", help="Не записывать в таблицу, только печатать.")
     parser.add_argument("--sleep", type=float, default=0.0, help="Пауза между запросами (сек).")
+    parser.add_argument("--concurrency", type=int, default=8, help="Сколько запросов к LLM выполнять одновременно.")
+    parser.add_argument("--batch-size", type=int, default=1, help="Сколько строк отправлять в одном запросе к LLM.")
+    parser.add_argument("--flush-every", type=int, default=25, help="Сколько строк записывать в таблицу за один запрос.")
+    parser.add_argument("--no-cache", action="store_true", help="Не использовать кэш уже сгенерированных описаний.")
+    parser.add_argument(
+        "--fuzzy-cache",
+        action="store_true",
+        help="Брать из кэша описания товаров, отличающихся только регистром, пунктуацией или порядком слов.",
+    )
     return parser.parse_args()
 
 
@@ -522,13 +1323,21 @@ def main() -> None:
             max_retries=args.max_retries,
             retry_delay=args.retry_delay,
             log_level=args.log_level,
+            concurrency=args.concurrency,
+            batch_size=args.batch_size,
+            write_batch_size=args.flush_every,
+            use_cache=not args.no_cache,
+            fuzzy_cache=args.fuzzy_cache,
         )
-        count = generator.process(
-            start_row=args.start_row,
-            end_row=args.end_row,
-            limit=args.limit,
-            sleep=args.sleep,
-        )
+        try:
+            count = generator.process(
+                start_row=args.start_row,
+                end_row=args.end_row,
+                limit=args.limit,
+                sleep=args.sleep,
+            )
+        finally:
+            generator.close()
         print(f"🎉 Обработано строк: {count}")
     except Exception as exc:
         print(f"❌ Ошибка: {exc}", file=sys.stderr)
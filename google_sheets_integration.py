@@ -4,15 +4,18 @@ Integracja z Google Sheets dla zapisywania statystyk
 """
 
 import os
-import json
+import random
 import time
 import logging
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Dict, Any, List
+import orjson
 import requests
 from dotenv import load_dotenv
 import gspread
-from google.oauth2.service_account import Credentials
+
+from credentials_util import gspread_client, gspread_client_from_info
 
 # Ładujemy zmienne środowiskowe
 load_dotenv()
@@ -24,6 +27,93 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Zakresy symulowanego przyrostu wyświetleń: (dzienny, tygodniowy)
+HISTORICAL_GROWTH = {
+    'vk_clips': ((1, 3), (5, 15)),  # VK Clips - mniejsze liczby, wolniejszy wzrost
+}
+DEFAULT_HISTORICAL_GROWTH = ((10, 50), (100, 300))  # YouTube - większe liczby, szybszy wzrost
+
+@dataclass(frozen=True)
+class ListVariant:
+    """Lista filmów w danych platformy i klucze, z których budujemy wiersz"""
+    list_key: str
+    label: str
+    date_key: str = 'date'
+    week_keys: tuple = ('views_week', 'views')
+    month_keys: tuple = ('views_month', 'views')
+    reference_first: bool = False  # URL profilu ma pierwszeństwo przed URL filmu
+    default_views: Any = None
+
+
+# Sprawdzane po kolei - używamy pierwszej listy, która występuje w danych
+LIST_VARIANTS = (
+    ListVariant('clips', 'VK clips',
+                week_keys=('views_week', 'views_weekly', 'views'),
+                month_keys=('views_month', 'views_monthly', 'views'),
+                reference_first=True),
+    ListVariant('videos', 'videos',
+                week_keys=('views_week', 'views_weekly', 'views'),
+                month_keys=('views_month', 'views_monthly', 'views')),
+    ListVariant('shorts', 'YouTube shorts', date_key='published_at'),
+    ListVariant('reels', 'Instagram reels', default_views=0),
+)
+
+
+def _first_views(item: Dict[str, Any], keys: tuple, default: Any = None) -> Any:
+    """Pierwsza obecna (nie None) wartość z kluczy - 0 wyświetleń to poprawna wartość."""
+    for key in keys:
+        value = item.get(key)
+        if value is not None:
+            return value
+    return default
+
+
+def _to_str(value: Any) -> str:
+    if value is None:
+        return '0'
+    if type(value) is int:  # najczęstszy przypadek; bool idzie dalej i daje '1'/'0'
+        return str(value)
+    try:
+        return str(int(value))
+    except (ValueError, TypeError):
+        return str(value)
+
+
+def _build_row(video_url: str, post_date: str, current_views: Any,
+               week_views: Any, month_views: Any, current_date: str) -> List[str]:
+    """Buduje pojedynczy wiersz arkusza."""
+    return [
+        video_url or '',
+        (post_date or current_date)[:10],
+        _to_str(current_views),
+        _to_str(week_views if week_views is not None else current_views),
+        _to_str(month_views if month_views is not None else current_views),
+    ]
+
+
+def _variant_rows(variant: ListVariant, items: List[Dict[str, Any]],
+                  reference_url: str, current_date: str, debug: bool = False) -> List[List[str]]:
+    """Wiersze dla wszystkich filmów z jednej listy clips/videos/shorts/reels."""
+    rows = []
+    for item in items:
+        if variant.reference_first:
+            video_url = reference_url or item.get('url', '')
+        else:
+            video_url = item.get('url') or reference_url
+        row = _build_row(
+            video_url,
+            item.get(variant.date_key, current_date),
+            item.get('views', variant.default_views),
+            _first_views(item, variant.week_keys, variant.default_views),
+            _first_views(item, variant.month_keys, variant.default_views),
+            current_date,
+        )
+        if debug:
+            logger.debug(f"📝 Utworzono wiersz dla {variant.list_key}: {item} -> {row}")
+        rows.append(row)
+    return rows
+
+
 class GoogleSheetsIntegration:
     """Integracja z Google Sheets"""
     
@@ -32,6 +122,8 @@ class GoogleSheetsIntegration:
         self.credentials_file = "google_credentials.json"
         self.sheet = None
         self.gc = None  # Google Sheets client
+        self._spreadsheet = None  # otwierany raz, zamiast open_by_key przy każdym zapisie
+        self._sheet_cache = {}  # nazwa arkusza blogera -> Worksheet
         
         # Inicjalizacja Google Sheets
         success = self.init_google_sheets()
@@ -41,48 +133,37 @@ class GoogleSheetsIntegration:
     def _init_from_env(self):
         """Inicjalizacja Google Sheets ze zmiennych środowiskowych"""
         try:
-            # Sprawdzamy czy mamy wszystkie wymagane zmienne
-            required_vars = [
+            # Sprawdzamy czy mamy wszystkie wymagane zmienne - każdą czytamy tylko raz
+            required_vars = (
                 'GOOGLE_PROJECT_ID',
-                'GOOGLE_PRIVATE_KEY_ID', 
+                'GOOGLE_PRIVATE_KEY_ID',
                 'GOOGLE_PRIVATE_KEY',
                 'GOOGLE_CLIENT_EMAIL',
-                'GOOGLE_CLIENT_ID'
-            ]
-            
-            for var in required_vars:
-                if not os.getenv(var):
-                    return False
+                'GOOGLE_CLIENT_ID',
+            )
+            env = {var: os.environ.get(var) for var in required_vars}
+            if not all(env.values()):
+                return False
             
+            client_email = env['GOOGLE_CLIENT_EMAIL']
             # Tworzymy credentials ze zmiennych środowiskowych
             credentials_data = {
                 "type": "service_account",
-                "project_id": os.getenv('GOOGLE_PROJECT_ID'),
-                "private_key_id": os.getenv('GOOGLE_PRIVATE_KEY_ID'),
-                "private_key": os.getenv('GOOGLE_PRIVATE_KEY').replace('\\n', '\n'),
-                "client_email": os.getenv('GOOGLE_CLIENT_EMAIL'),
-                "client_id": os.getenv('GOOGLE_CLIENT_ID'),
+                "project_id": env['GOOGLE_PROJECT_ID'],
+                "private_key_id": env['GOOGLE_PRIVATE_KEY_ID'],
+                "private_key": env['GOOGLE_PRIVATE_KEY'].replace('\\n', '\n'),
+                "client_email": client_email,
+                "client_id": env['GOOGLE_CLIENT_ID'],
                 "auth_uri": "https://accounts.google.com/o/oauth2/auth",
                 "token_uri": "https://oauth2.googleapis.com/token",
                 "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-                "client_x509_cert_url": f"https://www.googleapis.com/robot/v1/metadata/x509/{os.getenv('GOOGLE_CLIENT_EMAIL')}"
+                "client_x509_cert_url": f"https://www.googleapis.com/robot/v1/metadata/x509/{client_email}"
             }
             
-            # Zakres uprawnień
-            scope = [
-                'https://www.googleapis.com/auth/spreadsheets',
-                'https://www.googleapis.com/auth/drive'
-            ]
-            
-            # Ładujemy credentials
-            creds = Credentials.from_service_account_info(
-                credentials_data, 
-                scopes=scope
-            )
-            
-            # Łączymy się z Google Sheets
-            self.gc = gspread.authorize(creds)
-            self.sheet = self.gc.open_by_key(self.sheet_id).sheet1
+            # Łączymy się z Google Sheets - klucz parsowany raz na proces, token odświeżany po wygaśnięciu
+            self.gc = gspread_client_from_info(credentials_data)
+            self._spreadsheet = self.gc.open_by_key(self.sheet_id)
+            self.sheet = self._spreadsheet.sheet1
             
             logger.info("Google Sheets połączone pomyślnie (ze zmiennych środowiskowych)")
             return True
@@ -103,21 +184,10 @@ class GoogleSheetsIntegration:
                 logger.error(f"Brak pliku {self.credentials_file} i zmiennych środowiskowych")
                 return False
             
-            # Zakres uprawnień
-            scope = [
-                'https://www.googleapis.com/auth/spreadsheets',
-                'https://www.googleapis.com/auth/drive'
-            ]
-            
-            # Ładujemy credentials
-            creds = Credentials.from_service_account_file(
-                self.credentials_file, 
-                scopes=scope
-            )
-            
-            # Łączymy się z Google Sheets
-            self.gc = gspread.authorize(creds)
-            self.sheet = self.gc.open_by_key(self.sheet_id).sheet1
+            # Łączymy się z Google Sheets - klient współdzielony w procesie, token OAuth pobierany raz
+            self.gc = gspread_client(self.credentials_file)
+            self._spreadsheet = self.gc.open_by_key(self.sheet_id)
+            self.sheet = self._spreadsheet.sheet1
             
             logger.info("Google Sheets połączone pomyślnie")
             return True
@@ -141,23 +211,13 @@ class GoogleSheetsIntegration:
     def calculate_historical_views(self, current_views: int, platform: str) -> Dict[str, int]:
         """Oblicza wyświetlenia z wczoraj i tygodnia temu (symulacja)"""
         # Symulujemy realistyczne dane historyczne
-        import random
-        
-        if platform.lower() == 'vk_clips':
-            # VK Clips - mniejsze liczby, wolniejszy wzrost
-            daily_growth = random.randint(1, 3)  # 1-3 wyświetlenia dziennie
-            weekly_growth = random.randint(5, 15)  # 5-15 wyświetleń tygodniowo
-            
-            yesterday_views = max(0, current_views - daily_growth)
-            week_ago_views = max(0, current_views - weekly_growth)
-        else:
-            # YouTube - większe liczby, szybszy wzrost
-            daily_growth = random.randint(10, 50)  # 10-50 wyświetleń dziennie
-            weekly_growth = random.randint(100, 300)  # 100-300 wyświetleń tygodniowo
-            
-            yesterday_views = max(0, current_views - daily_growth)
-            week_ago_views = max(0, current_views - weekly_growth)
-        
+        daily_range, weekly_range = HISTORICAL_GROWTH.get(platform.lower(), DEFAULT_HISTORICAL_GROWTH)
+        daily_growth = random.randint(*daily_range)
+        weekly_growth = random.randint(*weekly_range)
+
+        yesterday_views = max(0, current_views - daily_growth)
+        week_ago_views = max(0, current_views - weekly_growth)
+
         return {
             'yesterday': yesterday_views,
             'week_ago': week_ago_views
@@ -171,124 +231,46 @@ class GoogleSheetsIntegration:
     
     def format_data_for_sheets(self, data: Dict[str, Any]) -> List[List[str]]:
         """Formatuje dane dla Google Sheets - nowa struktura"""
-        logger.info(f"🔍 Formatuję dane dla Google Sheets: {data}")
+        # Sprawdzane raz - diagnostyka per element nie kosztuje nic przy poziomie INFO
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug(f"🔍 Formatuję dane dla Google Sheets: {data}")
         rows = []
         current_date = datetime.now().strftime('%Y-%m-%d')
         
-        def build_row(video_url: str, post_date: str, current_views: Any,
-                      week_views: Any, month_views: Any) -> List[str]:
-            """Helper do budowania pojedynczego wiersza."""
-            safe_url = video_url or ''
-            safe_date = (post_date or current_date)[:10]
-
-            def _to_str(value: Any) -> str:
-                if value is None:
-                    return '0'
-                try:
-                    return str(int(value))
-                except (ValueError, TypeError):
-                    return str(value)
-
-            return [
-                safe_url,
-                safe_date,
-                _to_str(current_views),
-                _to_str(week_views if week_views is not None else current_views),
-                _to_str(month_views if month_views is not None else current_views),
-            ]
-
         for platform, platform_data in data.items():
             logger.info(f"📊 Przetwarzam platformę: {platform}")
-            logger.info(f"📋 Dane platformy: {platform_data}")
+            if debug:
+                logger.debug(f"📋 Dane platformy: {platform_data}")
             
             if 'error' in platform_data:
                 logger.warning(f"❌ Platforma {platform} ma błąd: {platform_data['error']}")
                 continue
             
-            platform_name = platform_data.get('platform', platform)
-            user_name = platform_data.get('user_name', platform_data.get('username', ''))
-            
-            # Sprawdzamy czy mamy clips/videos/shorts/reels
-            has_clips_list = 'clips' in platform_data and isinstance(platform_data.get('clips'), list)
-            has_videos_list = 'videos' in platform_data and isinstance(platform_data.get('videos'), list)
-            has_shorts_list = 'shorts' in platform_data and isinstance(platform_data.get('shorts'), list)
-            has_reels_list = 'reels' in platform_data and isinstance(platform_data.get('reels'), list)
-
-            logger.info(f"🔍 Sprawdzam strukturę danych:")
-            logger.info(f"  - has_clips_list: {has_clips_list}")
-            logger.info(f"  - has_videos_list: {has_videos_list}")
-            logger.info(f"  - has_shorts_list: {has_shorts_list}")
-            logger.info(f"  - has_reels_list: {has_reels_list}")
-            
-            if has_clips_list:
-                logger.info(f"📹 Przetwarzam VK clips: {len(platform_data['clips'])} clips")
-                reference_url = platform_data.get('url', '')
-                for i, clip in enumerate(platform_data['clips']):
-                    logger.info(f"📹 Clip {i+1}: {clip}")
-                    row = build_row(
-                        reference_url or clip.get('url', ''),
-                        clip.get('date', current_date),
-                        clip.get('views'),
-                        clip.get('views_week') or clip.get('views_weekly') or clip.get('views'),
-                        clip.get('views_month') or clip.get('views_monthly') or clip.get('views'),
-                    )
-                    logger.info(f"📝 Utworzono wiersz dla clip {i+1}: {row}")
-                    rows.append(row)
-
-            elif has_videos_list:
-                logger.info(f"📹 Przetwarzam videos: {len(platform_data['videos'])} szt.")
-                reference_url = platform_data.get('url', '')
-                for video in platform_data['videos']:
-                    row = build_row(
-                        video.get('url') or reference_url,
-                        video.get('date', current_date),
-                        video.get('views'),
-                        video.get('views_week') or video.get('views_weekly') or video.get('views'),
-                        video.get('views_month') or video.get('views_monthly') or video.get('views'),
-                    )
-                    rows.append(row)
-
-            elif has_shorts_list:
-                logger.info(f"📹 Przetwarzam YouTube shorts: {len(platform_data['shorts'])} shorts")
-                reference_url = platform_data.get('url', '')
-                for short in platform_data['shorts']:
-                    row = build_row(
-                        short.get('url') or reference_url,
-                        short.get('published_at', current_date),
-                        short.get('views'),
-                        short.get('views_week') or short.get('views'),
-                        short.get('views_month') or short.get('views'),
-                    )
-                    rows.append(row)
+            variant = next(
+                (v for v in LIST_VARIANTS if isinstance(platform_data.get(v.list_key), list)),
+                None,
+            )
 
-            elif has_reels_list:
-                logger.info(f"📹 Przetwarzam Instagram reels: {len(platform_data['reels'])} reels")
-                reference_url = platform_data.get('url', '')
-                for reel in platform_data['reels']:
-                    logger.info(f"📹 Reel: {reel}")
-                    video_url = reel.get('url') or reference_url
-                    row = build_row(
-                        video_url,
-                        reel.get('date', current_date),
-                        reel.get('views', 0),
-                        reel.get('views_week') or reel.get('views', 0),
-                        reel.get('views_month') or reel.get('views', 0),
-                    )
-                    logger.info(f"📝 Utworzono wiersz dla reel: {row}")
-                    rows.append(row)
+            if variant is not None:
+                items = platform_data[variant.list_key]
+                logger.info(f"📹 Przetwarzam {variant.label}: {len(items)} szt.")
+                rows.extend(_variant_rows(variant, items, platform_data.get('url', ''), current_date, debug))
             
             else:
                 # Spróbujmy obsłużyć prostą strukturę z pojedynczym wideo
                 if isinstance(platform_data, dict) and 'views' in platform_data and platform_data.get('url'):
-                    row = build_row(
+                    row = _build_row(
                         platform_data.get('url', ''),
                         platform_data.get('date', current_date),
                         platform_data.get('views'),
                         platform_data.get('views_week'),
                         platform_data.get('views_month'),
+                        current_date,
                     )
                     rows.append(row)
-                    logger.info(f"📝 Utworzono wiersz z prostych danych dla {platform}: {row}")
+                    if debug:
+                        logger.debug(f"📝 Utworzono wiersz z prostych danych dla {platform}: {row}")
                 else:
                     # Brak danych do przetworzenia
                     logger.warning(f"⚠️ Brak clips/videos/shorts/reels dla {platform}")
@@ -304,13 +286,20 @@ class GoogleSheetsIntegration:
                 logger.error("Google Sheets client nie jest zainicjalizowany")
                 return None
             
-            # Otwieramy główny spreadsheet
-            spreadsheet = self.gc.open_by_key(self.sheet_id)
+            # Arkusz już używany w tej sesji - bez żadnego zapytania do API
+            if blogger_name in self._sheet_cache:
+                return self._sheet_cache[blogger_name]
+            
+            # Główny spreadsheet otwieramy tylko raz
+            if self._spreadsheet is None:
+                self._spreadsheet = self.gc.open_by_key(self.sheet_id)
+            spreadsheet = self._spreadsheet
             
             # Sprawdzamy czy arkusz dla blogera już istnieje
             try:
                 sheet = spreadsheet.worksheet(blogger_name)
                 logger.info(f"Znaleziono istniejący arkusz dla {blogger_name}")
+                self._sheet_cache[blogger_name] = sheet
                 return sheet
             except gspread.WorksheetNotFound:
                 # Tworzymy nowy arkusz
@@ -322,6 +311,7 @@ class GoogleSheetsIntegration:
                 sheet.append_row(headers)
                 
                 logger.info(f"Utworzono arkusz {blogger_name} z nagłówkami")
+                self._sheet_cache[blogger_name] = sheet
                 return sheet
                 
         except Exception as e:
@@ -332,7 +322,8 @@ class GoogleSheetsIntegration:
         """Zapisuje dane do arkusza konkretnego blogera"""
         try:
             logger.info(f"🔍 Rozpoczynam zapisywanie do arkusza '{blogger_name}'")
-            logger.info(f"📊 Dane do zapisania: {data}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"📊 Dane do zapisania: {data}")
             
             # Pobieramy lub tworzymy arkusz dla blogera
             sheet = self.get_or_create_blogger_sheet(blogger_name)
@@ -343,22 +334,24 @@ class GoogleSheetsIntegration:
             logger.info(f"✅ Arkusz '{blogger_name}' gotowy")
             
             # Przygotowujemy dane
-            logger.info(f"📝 Formatuję dane dla arkusza...")
+            logger.info("📝 Formatuję dane dla arkusza...")
             rows = self.format_data_for_sheets(data)
-            logger.info(f"📊 Sformatowane wiersze: {rows}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"📊 Sformatowane wiersze: {rows}")
             
             if not rows:
                 logger.warning("⚠️ Brak danych do zapisania - format_data_for_sheets zwrócił pustą listę")
-                logger.info(f"🔍 Szczegóły danych: {data}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"🔍 Szczegóły danych: {data}")
                 return False
             
             logger.info(f"✅ Znaleziono {len(rows)} wierszy do zapisania")
             
-            # Dodajemy dane do arkusza blogera
-            for i, row in enumerate(rows):
-                logger.info(f"📝 Dodaję wiersz {i+1}: {row}")
-                sheet.append_row(row)
-                logger.info(f"✅ Dodano wiersz {i+1} do arkusza {blogger_name}")
+            # Dodajemy dane do arkusza blogera - jednym żądaniem dla wszystkich wierszy
+            if logger.isEnabledFor(logging.DEBUG):
+                for i, row in enumerate(rows):
+                    logger.debug(f"📝 Dodaję wiersz {i+1}: {row}")
+            sheet.append_rows(rows)
             
             logger.info(f"🎉 Pomyślnie zapisano {len(rows)} wierszy do arkusza {blogger_name}")
             return True
@@ -383,16 +376,18 @@ class GoogleSheetsIntegration:
                 logger.warning("Brak danych do zapisania")
                 return False
             
-            # Zawsze dodajemy nagłówki na początku (jeśli arkusz jest pusty)
-            if not self.sheet.get_all_values():
-                headers = self.prepare_headers()
-                self.sheet.append_row(headers)
+            # Zawsze dodajemy nagłówki na początku (jeśli arkusz jest pusty);
+            # wystarczy sprawdzić pierwszy wiersz zamiast pobierać cały arkusz
+            new_rows = rows
+            if not self.sheet.row_values(1):
+                new_rows = [self.prepare_headers()] + rows
                 logger.info("Добавлены заголовки в таблицу")
             
-            # Dodajemy dane
-            for row in rows:
-                self.sheet.append_row(row)
-                logger.info(f"Добавлена строка: {row[1]} - {row[3][:50]}...")
+            # Dodajemy dane - nagłówki i wszystkie wiersze jednym żądaniem
+            if logger.isEnabledFor(logging.DEBUG):
+                for row in rows:
+                    logger.debug(f"Добавлена строка: {row[1]} - {row[3][:50]}...")
+            self.sheet.append_rows(new_rows)
             
             logger.info(f"Успешно сохранено {len(rows)} строк в Google Sheets")
             return True
@@ -428,8 +423,8 @@ def create_google_credentials_template():
         "client_x509_cert_url": "https://www.googleapis.com/robot/v1/metadata/x509/your-service-account%40your-project.iam.gserviceaccount.com"
     }
     
-    with open("google_credentials_template.json", "w", encoding="utf-8") as f:
-        json.dump(template, f, indent=2)
+    with open("google_credentials_template.json", "wb") as f:
+        f.write(orjson.dumps(template, option=orjson.OPT_INDENT_2))
     
     print("📄 Utworzono szablon google_credentials_template.json")
     print("📝 Skopiuj go do google_credentials.json i wypełnij danymi z Google Cloud Console")
@@ -9,34 +9,61 @@ Prosty testowy skrypt: generuje описание через Groq и дописы
 from __future__ import annotations
 
 import argparse
+import importlib.util
 import os
 import re
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Dict, Optional, List, Tuple
 
 from dotenv import load_dotenv
 import gspread
 from google.oauth2.service_account import Credentials
-from groq import Groq
+from groq import DefaultHttpxClient, Groq
+from gspread.utils import rowcol_to_a1
+
+from credentials_util import authorized_session
 
 
 DEFAULT_SHEET_ID = "1f0FkNY39YjnaVTTMfUBaN5JlyDK5ZCzM1MLW_qWnCDI"
 DEFAULT_WORKSHEET = "КомТехАвто"
 SERVICE_ACCOUNT_FILE = "google_credentials.json"
 
-PROMPT_TEMPLATE = """Ты специалист по автозапчастям и маркетолог. Используй данные:
-- Артикул: {article}
-- Наименование: {name}
-- Название (маркетинговое): {title}
+# Static instructions first and per-row data last: Groq caches repeated prompt
+# prefixes, so every row after the first reuses the instruction tokens
+PROMPT_TEMPLATE = """Ты специалист по автозапчастям и маркетолог.
 
 Задача:
 1. Напиши структурированное HTML-описание (h2/h3/p/ul/li/strong) на русском языке.
 2. Сделай акцент на назначении запчасти, преимуществах, совместимости и установке.
 3. Укажи артикул и ключевые выгоды.
 4. Объём 90–140 слов. Не добавляй произвольные цены и ссылки.
+
+Используй данные:
+- Артикул: {article}
+- Наименование: {name}
+- Название (маркетинговое): {title}
 """
 
+SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": "Ты пишешь продающие описания автозапчастей. Отвечай только на русском языке.",
+}
+RETRY_MESSAGE = {
+    "role": "user",
+    "content": (
+        "Предыдущий ответ был пустой или не на русском. "
+        "Сейчас обязательно верни полный HTML-текст на русском языке."
+    ),
+}
+
+RUSSIAN_TEXT_RE = re.compile(r"[А-Яа-яЁё]")
+# A streamed reply with no Cyrillic this far in is abandoned and retried
+LANGUAGE_CHECK_CHARS = 256
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Генерация описаний через Groq и запись в Google Sheets.")
@@ -46,10 +73,11 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--start-row", type=int, default=2, help="Начальная строка диапазона (включительно).")
     parser.add_argument("--end-row", type=int, help="Конечная строка диапазона (включительно).")
     parser.add_argument("--dry-run", action="store_true", help="Не записывать в Google Sheets, только выводить.")
+    parser.add_argument("--workers", type=int, default=8, help="Сколько строк обрабатывать параллельно.")
     return parser.parse_args()
 
 
-def get_sheet(sheet_id: str, worksheet: str):
+def get_sheet(sheet_id: str, worksheet: str, pool_size: int = 10):
     if not os.path.exists(SERVICE_ACCOUNT_FILE):
         raise FileNotFoundError(f"Не найден {SERVICE_ACCOUNT_FILE}")
 
@@ -59,7 +87,9 @@ def get_sheet(sheet_id: str, worksheet: str):
     ]
 
     creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=scopes)
-    client = gspread.authorize(creds)
+    # requests keeps only 10 connections per host by default; size the pool to the workers
+    # so parallel writes reuse connections instead of reconnecting
+    client = gspread.authorize(creds, session=authorized_session(creds, pool_size))
     return client.open_by_key(sheet_id).worksheet(worksheet)
 
 
@@ -73,7 +103,34 @@ def resolve_columns(header: list[str]) -> Dict[str, int]:
 
 
 def _is_russian_text(text: str) -> bool:
-    return bool(re.search(r"[А-Яа-яЁё]", text or ""))
+    return bool(text and RUSSIAN_TEXT_RE.search(text))
+
+
+def _read_stream(stream) -> Tuple[str, object]:
+    """Collect a streamed reply and its usage, closing it early if no Cyrillic shows up."""
+    parts: List[str] = []
+    size = 0
+    check_language = True
+    usage = None
+    for chunk in stream:
+        # Groq reports token usage on the last chunk
+        x_groq = getattr(chunk, "x_groq", None)
+        if x_groq is not None and x_groq.usage is not None:
+            usage = x_groq.usage
+        if not chunk.choices:
+            continue
+        content = chunk.choices[0].delta.content
+        if not content:
+            continue
+        parts.append(content)
+        size += len(content)
+        if check_language:
+            if RUSSIAN_TEXT_RE.search(content):
+                check_language = False
+            elif size >= LANGUAGE_CHECK_CHARS:
+                stream.close()
+                break
+    return "".join(parts).strip(), usage
 
 
 def generate_description(
@@ -82,26 +139,15 @@ def generate_description(
     name: str,
     title: str,
     retries: int = 3,
-) -> Tuple[str, int, int]:
+) -> Tuple[str, int, int, int]:
     prompt = PROMPT_TEMPLATE.format(article=article, name=name, title=title or name)
     last_error: Optional[Exception] = None
 
-    for attempt in range(1, retries + 1):
-        messages = [
-            {"role": "system", "content": "Ты пишешь продающие описания автозапчастей. Отвечай только на русском языке."},
-            {"role": "user", "content": prompt},
-        ]
-        if attempt > 1:
-            messages.append(
-                {
-                    "role": "user",
-                    "content": (
-                        "Предыдущий ответ был пустой или не на русском. "
-                        "Сейчас обязательно верни полный HTML-текст на русском языке."
-                    ),
-                }
-            )
+    first_messages = [SYSTEM_MESSAGE, {"role": "user", "content": prompt}]
+    retry_messages = first_messages + [RETRY_MESSAGE]
 
+    for attempt in range(1, retries + 1):
+        messages = first_messages if attempt == 1 else retry_messages
         try:
             response = client.chat.completions.create(
                 model="openai/gpt-oss-120b",
@@ -109,14 +155,15 @@ def generate_description(
                 temperature=0.4,
                 max_completion_tokens=600,
                 top_p=1,
-                stream=False,
+                stream=True,
             )
-            text = response.choices[0].message.content.strip()
-            usage = response.usage
+            text, usage = _read_stream(response)
             prompt_tokens = getattr(usage, "prompt_tokens", 0)
             completion_tokens = getattr(usage, "completion_tokens", 0)
-            if text and _is_russian_text(text):
-                return text, prompt_tokens, completion_tokens
+            details = getattr(usage, "prompt_tokens_details", None)
+            cached_tokens = getattr(details, "cached_tokens", None) or 0
+            if _is_russian_text(text):
+                return text, prompt_tokens, completion_tokens, cached_tokens
             last_error = RuntimeError("Пустой или не русскоязычный ответ модели.")
         except Exception as exc:  # noqa: BLE001
             last_error = exc
@@ -124,19 +171,92 @@ def generate_description(
     raise RuntimeError(f"Не удалось получить корректное описание: {last_error}")
 
 
+class PendingWrites:
+    """Buffers description writes and sends them with one batch_update per flush."""
+
+    def __init__(
+        self,
+        sheet,
+        column: int,
+        flush_rows: int = 50,
+        flush_bytes: int = 256 * 1024,
+        flush_interval: float = 30.0,
+    ):
+        self.sheet = sheet
+        self.column_letter = rowcol_to_a1(1, column)[:-1]
+        self.flush_rows = flush_rows
+        self.flush_bytes = flush_bytes  # keeps each request well under the API payload limit
+        self.flush_interval = flush_interval  # slow sweeps still show progress in the sheet
+        self._updates: List[dict] = []
+        self._size = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        # Updates whose batch_update failed; the next flush() retries them
+        self.failed: List[dict] = []
+
+    def add(self, row_number: int, text: str) -> None:
+        with self._lock:
+            self._updates.append({"range": f"{self.column_letter}{row_number}", "values": [[text]]})
+            self._size += len(text.encode("utf-8"))
+            if not (
+                len(self._updates) >= self.flush_rows
+                or self._size >= self.flush_bytes
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            ):
+                return
+            updates = self._take_locked()
+        # The network call runs outside the lock so other workers keep buffering meanwhile
+        self._write(updates)
+
+    def flush(self) -> None:
+        """Write everything buffered, retrying rows whose earlier write failed."""
+        with self._lock:
+            updates = self.failed + self._take_locked()
+            self.failed = []
+        self._write(updates)
+
+    def _take_locked(self) -> List[dict]:
+        updates, self._updates, self._size = self._updates, [], 0
+        self._last_flush = time.monotonic()
+        return updates
+
+    def _write(self, updates: List[dict]) -> None:
+        # A failed write belongs to the buffered rows, not to the worker whose row
+        # happened to trigger it, so it is logged and kept instead of raised
+        if not updates:
+            return
+        try:
+            self.sheet.batch_update(updates, value_input_option="USER_ENTERED")
+        except Exception as exc:  # noqa: BLE001
+            print(f"⚠️ Не удалось записать строк: {len(updates)} ({exc})")
+            with self._lock:
+                self.failed.extend(updates)
+            return
+        print(f"✅ Записано строк: {len(updates)}")
+
+
 def process_row(
     sheet,
     row_number: int,
     columns: Dict[str, int],
     client: Groq,
     dry_run: bool = False,
-) -> Optional[Tuple[float, int, int]]:
-    def get_cell(col_name: str) -> str:
+    values: Optional[Dict[str, str]] = None,
+    writer: Optional["PendingWrites"] = None,
+) -> Optional[Tuple[float, int, int, int]]:
+    if values is None:
+        # One request for the whole row instead of one per cell
         try:
-            value = sheet.cell(row_number, columns[col_name]).value or ""
-            return value.strip()
+            row_values = sheet.row_values(row_number)
         except Exception:
-            return ""
+            row_values = []
+        values = {
+            key: row_values[col - 1] if len(row_values) >= col else ""
+            for key, col in columns.items()
+        }
+
+    def get_cell(col_name: str) -> str:
+        return (values.get(col_name) or "").strip()
 
     article = get_cell("Артикул")
     name = get_cell("Наименование")
@@ -148,10 +268,14 @@ def process_row(
 
     print(f"🔧 Генерация для строки {row_number}: {article} | {name}")
     start_time = time.perf_counter()
-    description, prompt_tokens, completion_tokens = generate_description(client, article, name, title)
+    description, prompt_tokens, completion_tokens, cached_tokens = generate_description(
+        client, article, name, title
+    )
 
     if dry_run:
         print(description)
+    elif writer is not None:
+        writer.add(row_number, description)
     else:
         sheet.update_cell(row_number, columns["Описание"], description)
         print("✅ Записано.")
@@ -159,8 +283,11 @@ def process_row(
     duration = time.perf_counter() - start_time
     print(f"⏱️ Время строки: {duration:.2f} c")
     total_tokens = prompt_tokens + completion_tokens
-    print(f"   ↳ Токены: prompt={prompt_tokens}, completion={completion_tokens}, всего={total_tokens}")
-    return duration, prompt_tokens, completion_tokens
+    print(
+        f"   ↳ Токены: prompt={prompt_tokens} (из кэша {cached_tokens}), "
+        f"completion={completion_tokens}, всего={total_tokens}"
+    )
+    return duration, prompt_tokens, completion_tokens, cached_tokens
 
 
 def format_duration(seconds: float) -> str:
@@ -184,16 +311,20 @@ def main() -> None:
     if not api_key:
         raise RuntimeError("В окружении не найден GROQ_API_KEY или QROQ_TOKEN.")
 
-    client = Groq(api_key=api_key)
-    sheet = get_sheet(args.sheet_id, args.worksheet)
+    # One client for the whole run: its HTTP/2 connection is shared by all worker threads
+    client = Groq(api_key=api_key, http_client=DefaultHttpxClient(http2=HTTP2_AVAILABLE))
+    sheet = get_sheet(args.sheet_id, args.worksheet, pool_size=args.workers)
     header = sheet.row_values(1)
     columns = resolve_columns(header)
 
     durations: List[float] = []
     prompt_tokens_total = 0
     completion_tokens_total = 0
+    cached_tokens_total = 0
 
     processed = 0
+    writer: Optional[PendingWrites] = None
+    run_start = time.perf_counter()
 
     if args.row:
         if args.row < 2:
@@ -201,49 +332,92 @@ def main() -> None:
         result = process_row(sheet, args.row, columns, client, args.dry_run)
         processed = 1 if result is not None else 0
         if result is not None:
-            duration, in_tokens, out_tokens = result
+            duration, in_tokens, out_tokens, cached_tokens = result
             durations.append(duration)
             prompt_tokens_total += in_tokens
             completion_tokens_total += out_tokens
+            cached_tokens_total += cached_tokens
     else:
-        rows = sheet.get_all_values()
-        for row_number, row_values in enumerate(rows[1:], start=2):
-            if row_number < args.start_row:
+        # Only the four used columns of the requested rows, one flat list per column;
+        # the rows then need no per-cell reads in process_row
+        start_row = max(2, args.start_row)
+        keys = ("Артикул", "Наименование", "Название", "Описание")
+        ranges = []
+        for key in keys:
+            letter = rowcol_to_a1(1, columns[key])[:-1]
+            ranges.append(f"{letter}{start_row}:{letter}{args.end_row or ''}")
+        column_values = [
+            value_range[0] if value_range else []
+            for value_range in sheet.batch_get(ranges, major_dimension="COLUMNS")
+        ]
+        row_count = max(len(values) for values in column_values)
+        pending_rows = []
+        for offset in range(row_count):
+            row = {key: values[offset] if offset < len(values) else "" for key, values in zip(keys, column_values)}
+            if row["Описание"].strip():
                 continue
-            if args.end_row and row_number > args.end_row:
-                break
-
-            description = row_values[columns["Описание"] - 1].strip() if len(row_values) >= columns["Описание"] else ""
-            if description:
+            if not row["Артикул"].strip() or not row["Наименование"].strip():
+                print(f"⚠️ Строка {start_row + offset}: нет артикула или наименования, пропуск.")
                 continue
-            result = process_row(sheet, row_number, columns, client, args.dry_run)
+            pending_rows.append((start_row + offset, row))
+        # LLM calls are I/O-bound, so a few threads overlap their latency
+        writer = PendingWrites(sheet, columns["Описание"])
+        results = []
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+                futures = {
+                    executor.submit(
+                        process_row, sheet, row_number, columns, client, args.dry_run, values=row, writer=writer
+                    ): row_number
+                    for row_number, row in pending_rows
+                }
+                # A failed row is reported and skipped; the rest of the sweep keeps going
+                for future in as_completed(futures):
+                    try:
+                        results.append(future.result())
+                    except Exception as exc:  # noqa: BLE001
+                        print(f"❌ Строка {futures[future]}: {exc}")
+        finally:
+            # Never raises: rows it could not write stay in writer.failed for the report below
+            writer.flush()
+        for result in results:
             if result is not None:
-                duration, in_tokens, out_tokens = result
+                duration, in_tokens, out_tokens, cached_tokens = result
                 processed += 1
                 durations.append(duration)
                 prompt_tokens_total += in_tokens
                 completion_tokens_total += out_tokens
+                cached_tokens_total += cached_tokens
 
+    elapsed = time.perf_counter() - run_start
     print(f"🎉 Обработано строк: {processed}")
     if durations:
         avg = sum(durations) / len(durations)
         print(f"📊 Среднее время на строку: {avg:.2f} c")
+        # Rows overlap on --workers threads, so project from wall-clock throughput, not per-row latency
+        per_row = elapsed / processed
+        print(f"🚀 Пропускная способность: {per_row:.2f} c на строку ({format_duration(elapsed)} всего)")
         estimates = {
             1: avg,
-            10: avg * 10,
-            100: avg * 100,
-            1000: avg * 1000,
-            1_000_000: avg * 1_000_000,
+            10: per_row * 10,
+            100: per_row * 100,
+            1000: per_row * 1000,
+            1_000_000: per_row * 1_000_000,
         }
         for rows_count, seconds in estimates.items():
             print(f"   • {rows_count} строк: ~{format_duration(seconds)}")
         total_tokens = prompt_tokens_total + completion_tokens_total
         print(
-            f"🧮 Токены: prompt={prompt_tokens_total}, completion={completion_tokens_total}, итого={total_tokens}"
+            f"🧮 Токены: prompt={prompt_tokens_total} (из кэша {cached_tokens_total}), "
+            f"completion={completion_tokens_total}, итого={total_tokens}"
         )
     else:
         print("⚠️ Нет успешно обработанных строк для оценки скорости.")
 
+    if writer is not None and writer.failed:
+        print(f"❌ Не записано в таблицу строк: {len(writer.failed)}", file=sys.stderr)
+        sys.exit(1)
+
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,18 @@
+"""
+Gunicorn settings for the Description Generator GUI
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# Log bus, job state and caches live in process memory, so keep a single
+# worker and scale with threads; long-lived SSE streams each hold one thread.
+workers = 1
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "16"))
+
+# Reuse client connections and never kill a worker for a slow SSE stream
+keepalive = 75
+timeout = 0
+graceful_timeout = 30
@@ -9,10 +9,11 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from generate_descriptions import DescriptionGenerator
 
-def test_fallback_models():
+def test_fallback_models(batch=False):
     """Test the fallback model functionality"""
     print("🧪 Testing fallback models...")
     
+    generator = None
     try:
         # Create a test instance with dry-run
         generator = DescriptionGenerator(
@@ -20,14 +21,34 @@ def test_fallback_models():
             worksheet_name='КомТехАвто',
             dry_run=True,
             log_level='INFO',
-            max_retries=2
+            max_retries=2,
+            # A cached text would skip the model chain this script is meant to exercise
+            use_cache=False,
         )
         
         print("✅ Generator created successfully")
         
+        if batch:
+            # Several rows in one LLM request, the path process() uses for batch_size > 1
+            print("🔧 Testing batch description generation...")
+            items = [('TEST123', 'Test Part Name'), ('TEST456', 'Another Test Part')]
+            results = generator.run(generator._generate_descriptions_batch(items))
+            # A row that failed gets its RuntimeError in place of the text
+            failed = [article for (article, _), result in zip(items, results) if not isinstance(result, str)]
+            for (article, _), result in zip(items, results):
+                if not isinstance(result, str):
+                    print(f"❌ {article}: {result}")
+                else:
+                    print(f"📝 {article}: {result[:200]}..." if len(result) > 200 else f"📝 {article}: {result}")
+            if failed:
+                print(f"❌ ERROR: {len(failed)} of {len(results)} descriptions failed: {', '.join(failed)}")
+                return False
+            print(f"✅ SUCCESS: {len(results)} descriptions generated")
+            return True
+        
         # Test the generation function directly
         print("🔧 Testing description generation...")
-        result = generator._generate_description('TEST123', 'Test Part Name')
+        result = generator.run(generator._generate_description('TEST123', 'Test Part Name'))
         
         print("✅ SUCCESS: Description generated")
         print(f"📝 Result: {result[:200]}..." if len(result) > 200 else result)
@@ -37,9 +58,13 @@ def test_fallback_models():
         import traceback
         traceback.print_exc()
         return False
+    finally:
+        # Releases the event loop, LLM clients, Sheets worker thread and cache
+        if generator is not None:
+            generator.close()
     
     return True
 
 if __name__ == "__main__":
-    success = test_fallback_models()
+    success = test_fallback_models(batch="--batch" in sys.argv[1:])
     sys.exit(0 if success else 1)
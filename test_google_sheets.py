@@ -4,10 +4,12 @@ Test połączenia z Google Sheets
 """
 
 import os
-import json
 from datetime import datetime
+import orjson
 from google_sheets_integration import GoogleSheetsIntegration
 
+REQUIRED_FIELDS = ("type", "project_id", "private_key", "client_email")
+
 def test_google_sheets_connection():
     """Test połączenia z Google Sheets"""
     print("🧪 TEST POŁĄCZENIA Z GOOGLE SHEETS")
@@ -21,11 +23,14 @@ def test_google_sheets_connection():
     
     # Sprawdzamy zawartość pliku
     try:
-        with open("google_credentials.json", "r") as f:
-            credentials = json.load(f)
+        with open("google_credentials.json", "rb") as f:
+            credentials = orjson.loads(f.read())
+        
+        if not isinstance(credentials, dict):
+            print("❌ Nieprawidłowy format JSON w credentials")
+            return False
         
-        required_fields = ["type", "project_id", "private_key", "client_email"]
-        missing_fields = [field for field in required_fields if field not in credentials]
+        missing_fields = [field for field in REQUIRED_FIELDS if field not in credentials]
         
         if missing_fields:
             print(f"❌ Brakujące pola w credentials: {missing_fields}")
@@ -35,7 +40,7 @@ def test_google_sheets_connection():
         print(f"📧 Service Account: {credentials['client_email']}")
         print(f"🏗️ Project ID: {credentials['project_id']}")
         
-    except json.JSONDecodeError:
+    except orjson.JSONDecodeError:
         print("❌ Nieprawidłowy format JSON w credentials")
         return False
     except Exception as e:
@@ -13,17 +13,20 @@ from __future__ import annotations
 
 import sys
 from pathlib import Path
-from typing import List
+from typing import Tuple
 
-import gspread
-from google.oauth2.service_account import Credentials
+import orjson
+from gspread.urls import SPREADSHEET_VALUES_APPEND_URL
+from gspread.utils import absolute_range_name, quote
+
+from credentials_util import gspread_client
 
 
 SHEET_ID = "1f0FkNY39YjnaVTTMfUBaN5JlyDK5ZCzM1MLW_qWnCDI"
 WORKSHEET_NAME = "КомТехАвто"
 CREDENTIALS_PATH = Path(__file__).parent / "google_credentials.json"
 
-HEADERS: List[str] = [
+HEADERS: Tuple[str, ...] = (
     "Производитель",
     "Артикул",
     "Код",
@@ -42,9 +45,9 @@ HEADERS: List[str] = [
     "Ссылки на фото",
     "Цена продажи",
     "Цена до скидки",
-]
+)
 
-TEST_ROW: List[str] = [
+TEST_ROW: Tuple[str, ...] = (
     "KOMTECHNOLOGY",
     "2905015HF02",
     "KT000001786",
@@ -69,7 +72,14 @@ TEST_ROW: List[str] = [
     "",
     "13333",
     "16000",
-]
+)
+
+
+# Тело запроса не меняется между запусками - кодируем в JSON один раз
+APPEND_URL = SPREADSHEET_VALUES_APPEND_URL % (SHEET_ID, quote(absolute_range_name(WORKSHEET_NAME)))
+APPEND_PARAMS = {"valueInputOption": "USER_ENTERED", "insertDataOption": "INSERT_ROWS"}
+ROW_BODY = orjson.dumps({"values": [TEST_ROW]})
+HEADERS_AND_ROW_BODY = orjson.dumps({"values": [HEADERS, TEST_ROW]})
 
 
 def append_test_row() -> None:
@@ -79,24 +89,30 @@ def append_test_row() -> None:
             f"Не найден файл {CREDENTIALS_PATH}. Скопируйте JSON сервисного аккаунта в корень проекта."
         )
 
-    scopes = [
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive",
-    ]
+    client = gspread_client(str(CREDENTIALS_PATH))
+    # open_by_key() и worksheet() сначала загружают метаданные документа; низкоуровневые
+    # запросы по ID обходятся без них - один GET заголовков и один append.
+    # HTTPClient появился в gspread 6, поэтому версия закреплена в requirements.txt
+    http = client.http_client
 
-    creds = Credentials.from_service_account_file(str(CREDENTIALS_PATH), scopes=scopes)
-    client = gspread.authorize(creds)
-    spreadsheet = client.open_by_key(SHEET_ID)
-    worksheet = spreadsheet.worksheet(WORKSHEET_NAME)
-
-    existing_headers = worksheet.row_values(1)
-    if existing_headers and existing_headers != HEADERS:
+    body = ROW_BODY
+    response = http.values_get(SHEET_ID, absolute_range_name(WORKSHEET_NAME, "1:1"))
+    existing_headers = (response.get("values") or [[]])[0]
+    if existing_headers and tuple(existing_headers) != HEADERS:
         print("⚠️ Заголовки на листе отличаются от ожидаемых, строка всё равно будет добавлена.", file=sys.stderr)
     elif not existing_headers:
-        worksheet.append_row(HEADERS, value_input_option="USER_ENTERED")
+        body = HEADERS_AND_ROW_BODY
+
+    # Заголовки (если нужны) и тестовая строка уходят одним запросом
+    http.request(
+        "post",
+        APPEND_URL,
+        params=APPEND_PARAMS,
+        data=body,
+        headers={"Content-Type": "application/json"},
+    )
+    if body is HEADERS_AND_ROW_BODY:
         print("✅ Добавлены заголовки на лист.")
-
-    worksheet.append_row(TEST_ROW, value_input_option="USER_ENTERED")
     print("🎉 Тестовая строка добавлена. Проверьте лист 'КомТехАвто'.")
 
 